@@ -8,7 +8,7 @@ import asyncio
 import logging
 import traceback
 import shutil
-from datetime import datetime
+from datetime import datetime, date, timedelta
 import io
 import aiohttp
 import time
@@ -16,6 +16,32 @@ import uuid
 import random
 import psutil
 import sys
+import argparse
+import sqlite3
+import zlib
+import gzip
+import hashlib
+import secrets
+import struct
+import re
+import heapq
+import bisect
+import threading
+from array import array
+from collections import UserDict, OrderedDict
+from collections.abc import MutableMapping
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageDraw, ImageFont
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
 
 # Set up logging
 logging.basicConfig(
@@ -29,19 +55,107 @@ logging.basicConfig(
 logger = logging.getLogger('discord_bot')
 
 # --------- Config -----------
+# `python main.py backup ...` runs the backup tool instead of the bot
+CLI_COMMAND = sys.argv[1] if len(sys.argv) > 1 else None
+
 TOKEN = os.getenv("DISCORD_BOT_TOKEN")
-if not TOKEN:
+if not TOKEN and CLI_COMMAND != "backup":
     print("Error: DISCORD_BOT_TOKEN environment variable not set!")
     print("Please set your Discord bot token in the Secrets tab.")
     exit(1)
 
 # Validate token format
-if not TOKEN.startswith(('Bot ', 'Bearer ')) and len(TOKEN) < 50:
+if TOKEN and not TOKEN.startswith(('Bot ', 'Bearer ')) and len(TOKEN) < 50:
     print("Warning: Token format appears invalid. Make sure you're using the bot token, not client secret.")
     print("Bot tokens are typically 59+ characters long.")
 
 GUILD_ID = 1362531923586453678  # Your guild ID here - only changeable in code
 
+# How often dirty data stores are written back to disk
+FLUSH_INTERVAL_SECONDS = 5
+
+# XP per message, and how many members may have buffered stats before they
+# are merged into member_stats ahead of the next flush
+XP_PER_MESSAGE = 5
+STATS_MAX_PENDING_MEMBERS = 5000
+
+# Message counts are kept per calendar day in a ring of this many buckets,
+# enough to cover the longest window shown (a 31-day month)
+MESSAGE_WINDOW_DAYS = 31
+
+# Announcements are queued per channel and sent no faster than Discord's
+# per-channel limit (messages, seconds); higher priority goes first
+OUTBOUND_CHANNEL_RATE = (5, 5.0)
+OUTBOUND_MAX_QUEUE = 200
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+# on_message work is queued and run by a pool of workers; when the queue is
+# full, message intake waits for room
+MESSAGE_QUEUE_SIZE = 1000
+MESSAGE_WORKERS = int(os.getenv("MESSAGE_WORKERS", "4"))
+# On shutdown, queued messages get this long to be processed before the
+# final flush
+MESSAGE_DRAIN_SECONDS = 10
+
+# Per-member daily activity for /analytics: one binary file per day, today's
+# file rewritten at most this often, older days pruned after the retention
+ACTIVITY_DIR = "activity"
+ACTIVITY_FLUSH_SECONDS = 60
+ACTIVITY_RETENTION_DAYS = 400
+
+# Charts are drawn in a small process pool; rendered PNGs are kept in an
+# LRU cache keyed by a hash of the chart's input data
+CHART_WORKERS = 2
+CHART_CACHE_SIZE = 64
+
+# Leaderboards are built at startup; rebuilds after a restore insert this
+# many members at a time before yielding to the event loop
+LEADERBOARD_BUILD_CHUNK = 2000
+
+# Sticky messages are re-posted at most once per window in each channel
+STICKY_DEBOUNCE_SECONDS = 5
+
+# Economy journal: balance/inventory changes are appended here and folded
+# into balances.json/inventories.json once the journal grows past the limit
+ECONOMY_JOURNAL_FILE = "economy_journal.log"
+ECONOMY_JOURNAL_ARCHIVE_DIR = "economy_journal_archive"
+ECONOMY_JOURNAL_COMPACT_BYTES = 1024 * 1024
+ECONOMY_STORES = ("balances.json", "inventories.json")
+
+# Giveaway joins are appended to a per-giveaway log and folded into
+# giveaways.json by the regular flush
+GIVEAWAY_LOG_DIR = "giveaway_participants"
+
+# On-disk format for the data stores: "json" (indented), "compact", "orjson",
+# "msgpack" or "zjson" (zlib-compressed compact JSON). Files in any format load.
+STORE_FORMAT = os.getenv("STORE_FORMAT", "compact").lower()
+
+# Rarely used stores are loaded on first access and dropped again after
+# sitting idle (and clean) for this long
+LAZY_STORES = {"profile_presets.json", "auctions.json", "member_warnings.json", "tierlist.json"}
+LAZY_STORE_IDLE_SECONDS = 30 * 60
+
+# Per-user stores split into shard files by a hash of the user ID, so a flush
+# only rewrites the shards that changed. The shard count of an existing
+# store is fixed by the files already on disk.
+SHARDED_STORES = {"member_stats.json", "balances.json", "inventories.json"}
+STORE_SHARD_COUNT = 16
+STORE_SHARD_DIR = "shards"
+
+# Backups are content-addressed: each snapshot is a manifest of hashes and
+# every distinct store payload is kept once, gzip-compressed
+BACKUP_DIR = "backups"
+# Microseconds keep two backups taken in the same second apart; older backups
+# were named to the second
+BACKUP_NAME_FORMATS = ("%Y%m%d_%H%M%S_%f", "%Y%m%d_%H%M%S")
+BACKUP_RETENTION = {"hourly": 24, "daily": 7, "weekly": 4}
+
+# Storage backend for the data stores: "json" (one file per store) or "sqlite"
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "json").lower()
+SQLITE_DB_PATH = os.getenv("SQLITE_DB_PATH", "bot_data.db")
+
 # Bot configuration that can be changed via commands
 BOT_CONFIG = {
     "tier_channel_id": 1362836497060855959,
@@ -80,15 +194,133 @@ intents.messages = True
 intents.guilds = True
 intents.reactions = True
 
-bot = commands.Bot(command_prefix="!", intents=intents)
+class TheBotKiller(commands.Bot):
+    async def close(self):
+        # Runs inside the event loop before the connection is torn down, so
+        # queued messages can still be processed and recorded
+        await message_pipeline.drain(MESSAGE_DRAIN_SECONDS)
+        await super().close()
+
+bot = TheBotKiller(command_prefix="!", intents=intents)
 tree = bot.tree
 
 # --------- Data loading & saving -----------
 
+# Binary formats start with this marker; JSON text can never start with a NUL byte
+STORE_FORMAT_MARKER = b"\x00TBK:"
+
+class JSONSerializer:
+    name = "json"
+    binary = False
+    # Whether dumps() may run in a worker while the store is being mutated.
+    # Indented output goes through json's pure-Python encoder, which can see
+    # a dict change size mid-walk; the C encoders hold the GIL throughout.
+    thread_safe = False
+
+    def dumps(self, data):
+        return json.dumps(data, indent=2).encode("utf-8")
+
+    def loads(self, payload):
+        return json.loads(payload)
+
+class CompactJSONSerializer(JSONSerializer):
+    name = "compact"
+    thread_safe = True
+
+    def dumps(self, data):
+        return json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+class OrjsonSerializer(JSONSerializer):
+    name = "orjson"
+    thread_safe = True
+
+    def dumps(self, data):
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+
+    def loads(self, payload):
+        return orjson.loads(payload)
+
+class ZlibJSONSerializer(CompactJSONSerializer):
+    name = "zjson"
+    binary = True
+
+    def dumps(self, data):
+        return zlib.compress(super().dumps(data), 6)
+
+    def loads(self, payload):
+        return super().loads(zlib.decompress(payload))
+
+class MsgpackSerializer:
+    name = "msgpack"
+    binary = True
+    thread_safe = True
+
+    def dumps(self, data):
+        return msgpack.packb(data, use_bin_type=True)
+
+    def loads(self, payload):
+        return msgpack.unpackb(payload, raw=False, strict_map_key=False)
+
+STORE_SERIALIZERS = {
+    "json": JSONSerializer(),
+    "compact": CompactJSONSerializer(),
+    "zjson": ZlibJSONSerializer(),
+}
+if orjson:
+    STORE_SERIALIZERS["orjson"] = OrjsonSerializer()
+if msgpack:
+    STORE_SERIALIZERS["msgpack"] = MsgpackSerializer()
+
+def get_serializer(name):
+    serializer = STORE_SERIALIZERS.get(name)
+    if serializer is None:
+        logger.warning(f"Store format '{name}' is not available, falling back to compact JSON")
+        serializer = STORE_SERIALIZERS["compact"]
+    return serializer
+
+store_serializer = get_serializer(STORE_FORMAT)
+json_reader = STORE_SERIALIZERS["orjson"] if orjson else STORE_SERIALIZERS["json"]
+
+def encode_store(data, serializer=None):
+    if isinstance(data, bytes):
+        # Already encoded on the event loop by prepare_store
+        return data
+    serializer = serializer or store_serializer
+    if isinstance(data, UserDict):
+        data = data.data
+    if isinstance(data, StatsTable):
+        data = data.snapshot()
+    payload = serializer.dumps(data)
+    if serializer.binary:
+        payload = STORE_FORMAT_MARKER + serializer.name.encode("ascii") + b"\n" + payload
+    return payload
+
+def prepare_store(data, serializer=None):
+    """Make store data safe to encode in a worker thread; runs on the loop."""
+    serializer = serializer or store_serializer
+    if isinstance(data, UserDict):
+        data = data.data
+    if isinstance(data, StatsTable):
+        data = data.snapshot()
+    if not serializer.thread_safe:
+        return encode_store(data, serializer)
+    return data
+
+def decode_store(payload):
+    if payload.startswith(STORE_FORMAT_MARKER):
+        header, _, body = payload.partition(b"\n")
+        name = header[len(STORE_FORMAT_MARKER):].decode("ascii")
+        if name not in STORE_SERIALIZERS:
+            raise ValueError(f"Store written in format '{name}', which is not installed")
+        return STORE_SERIALIZERS[name].loads(body)
+    if not payload.strip():
+        return {}
+    return json_reader.loads(payload)
+
 def load_json(file_name):
     if os.path.isfile(file_name):
-        with open(file_name, "r") as f:
-            return json.load(f)
+        with open(file_name, "rb") as f:
+            return decode_store(f.read())
     return {}
 
 # Load bot configuration
@@ -96,47 +328,944 @@ bot_config = load_json("bot_config.json")
 if bot_config:
     BOT_CONFIG.update(bot_config)
 
-tier_data = load_json("tierlist.json")
-member_stats = load_json("member_stats.json")
-shops_data = load_json("shops.json")
-user_balances = load_json("balances.json")
-user_inventories = load_json("inventories.json")
-reaction_roles = load_json("reaction_roles.json")
-sticky_messages = load_json("sticky_messages.json")
-server_settings = load_json("server_settings.json")
-verification_data = load_json("verification.json")
-user_profiles = load_json("user_profiles.json")
-giveaways_data = load_json("giveaways.json")
-auction_data = load_json("auctions.json")
-premium_slots = load_json("premium_slots.json")
-logging_settings = load_json("logging_settings.json")
-member_warnings = load_json("member_warnings.json")
-autoresponders = load_json("autoresponders.json")
-profile_presets = load_json("profile_presets.json")
+def write_file_atomic(file_name, payload):
+    """Replace ``file_name`` with ``payload`` so readers never see a partial file."""
+    directory = os.path.dirname(os.path.abspath(file_name))
+    tmp_name = os.path.join(directory, f".{os.path.basename(file_name)}.tmp")
+    with open(tmp_name, "wb") as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_name, file_name)
+
+    if hasattr(os, "O_DIRECTORY"):
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+def dump_store_file(file_name, data):
+    write_file_atomic(file_name, encode_store(data))
+
+class AtomicStoreWriter:
+    """Writes stores in the default executor, one write in flight per file."""
+
+    def __init__(self):
+        self.inflight = {}
+        self.pending = {}
+        # Data that has been requested but not yet confirmed on disk
+        self.unwritten = {}
+
+    def request(self, file_name, data):
+        self.unwritten[file_name] = data
+        self.pending[file_name] = data
+        if file_name not in self.inflight:
+            self.inflight[file_name] = asyncio.get_running_loop().create_task(self.run(file_name))
+
+    async def save(self, file_name, data):
+        """Request a write and wait for it; returns True once it is on disk."""
+        self.request(file_name, data)
+        while file_name in self.inflight:
+            await asyncio.shield(self.inflight[file_name])
+        return file_name not in self.unwritten
+
+    async def run(self, file_name):
+        loop = asyncio.get_running_loop()
+        try:
+            while file_name in self.pending:
+                data = self.pending.pop(file_name)
+                try:
+                    prepared = prepare_store(data)
+                    await loop.run_in_executor(None, dump_store_file, file_name, prepared)
+                except Exception as e:
+                    logger.error(f"Failed to save {file_name}: {e}")
+                    continue
+                if file_name not in self.pending:
+                    self.unwritten.pop(file_name, None)
+        finally:
+            self.inflight.pop(file_name, None)
+
+    def retry_failed(self):
+        """Request again every write that failed; its data is still in ``unwritten``."""
+        for file_name, data in list(self.unwritten.items()):
+            if file_name not in self.inflight:
+                self.request(file_name, data)
+
+    def discard(self, file_name):
+        self.unwritten.pop(file_name, None)
+        self.pending.pop(file_name, None)
+
+    def flush_sync(self):
+        """Write everything still outstanding; used once the event loop is gone."""
+        for file_name, data in list(self.unwritten.items()):
+            try:
+                dump_store_file(file_name, data)
+                del self.unwritten[file_name]
+            except Exception as e:
+                logger.error(f"Failed to save {file_name}: {e}")
+        self.pending.clear()
+
+store_writer = AtomicStoreWriter()
 
 def save_json(file_name, data):
-    with open(file_name, "w") as f:
-        json.dump(data, f, indent=2)
+    if isinstance(data, (SQLiteStore, ShardedStore)):
+        data.flush()
+        return
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        dump_store_file(file_name, data)
+        # Anything a cancelled write left behind for this file is now stale
+        store_writer.discard(file_name)
+        return
+
+    store_writer.request(file_name, data)
+
+class SQLiteBackend:
+    """SQLite database (WAL mode) with one key/JSON-value table per store."""
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS migrations (name TEXT PRIMARY KEY, migrated_at INTEGER NOT NULL)")
+        self.conn.commit()
+
+    @staticmethod
+    def table_for(file_name):
+        return os.path.splitext(os.path.basename(file_name))[0]
+
+    def open_store(self, file_name):
+        table = self.table_for(file_name)
+        with self.conn:
+            self.conn.execute(f'CREATE TABLE IF NOT EXISTS "{table}" (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+            self.create_indexes(table)
+
+            migrated = self.conn.execute("SELECT 1 FROM migrations WHERE name = ?", (table,)).fetchone()
+            if not migrated:
+                self.import_json(table, file_name)
+
+        return SQLiteStore(self, table)
+
+    def create_indexes(self, table):
+        if table == "member_stats":
+            # Rankings come from the in-memory leaderboards, so nothing reads this index.
+            self.conn.execute("DROP INDEX IF EXISTS member_stats_xp")
+        elif table == "giveaways":
+            self.conn.execute("CREATE INDEX IF NOT EXISTS giveaways_status ON giveaways (json_extract(value, '$.status'))")
+        elif table == "member_warnings":
+            # Databases created by earlier builds kept a per-staff copy of every
+            # warning through triggers; nothing reads it, so stop maintaining it.
+            self.conn.executescript("""
+                DROP TRIGGER IF EXISTS member_warnings_insert;
+                DROP TRIGGER IF EXISTS member_warnings_update;
+                DROP TRIGGER IF EXISTS member_warnings_delete;
+                DROP TABLE IF EXISTS warnings_by_staff;
+            """)
+
+    def import_json(self, table, file_name):
+        """One-shot import of an existing JSON store into its table."""
+        shards = ShardedStore(file_name, STORE_SHARD_COUNT, STORE_SHARD_DIR) if file_name in SHARDED_STORES else None
+        if shards is not None and os.path.exists(shards.layout_path()):
+            # Once split, the shards are the live copy of this store
+            data = shards.load().data
+        else:
+            data = load_json(file_name)
+        self.conn.executemany(
+            f'INSERT INTO "{table}" (key, value) VALUES (?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET value = excluded.value',
+            [(str(key), json.dumps(value)) for key, value in data.items()]
+        )
+        self.conn.execute("INSERT INTO migrations (name, migrated_at) VALUES (?, ?)", (table, int(time.time())))
+        if data:
+            logger.info(f"Imported {len(data)} rows from {file_name} into SQLite table {table}")
+
+    def unclaimed_giveaways(self):
+        rows = self.conn.execute(
+            "SELECT key, value FROM giveaways WHERE json_extract(value, '$.status') = 'ended' "
+            "AND json_array_length(value, '$.winners_list') > 0"
+        )
+        unclaimed = []
+        for key, value in rows:
+            giveaway = json.loads(value)
+            claimed_winners = giveaway.get("claimed_winners", [])
+            unclaimed_winners = [w for w in giveaway["winners_list"] if w not in claimed_winners]
+            if unclaimed_winners:
+                unclaimed.append((key, giveaway, unclaimed_winners))
+        return unclaimed
+
+class SQLiteStore(UserDict):
+    """Dict-like store cached in memory that writes changed rows to a SQLite table."""
+
+    def __init__(self, backend, table):
+        super().__init__()
+        self.backend = backend
+        self.table = table
+        self.dirty_keys = set()
+        self.deleted_keys = set()
+        self.written = {}
+
+        for key, value in backend.conn.execute(f'SELECT key, value FROM "{table}"'):
+            self.data[key] = json.loads(value)
+            self.written[key] = hash(value)
+
+    def __setitem__(self, key, value):
+        self.data[key] = value
+        self.dirty_keys.add(key)
+        self.deleted_keys.discard(key)
+
+    def __delitem__(self, key):
+        del self.data[key]
+        self.dirty_keys.discard(key)
+        self.deleted_keys.add(key)
+
+    def flush(self, keys=None):
+        """Write changed rows; with ``keys`` only those rows are checked."""
+        candidates = self.data.keys() if keys is None else set(keys) | self.dirty_keys
+        upserts = []
+        for key in candidates:
+            if key not in self.data:
+                continue
+            value = json.dumps(self.data[key])
+            value_hash = hash(value)
+            if self.written.get(key) != value_hash:
+                upserts.append((key, value, value_hash))
+
+        deletes = [key for key in self.deleted_keys if key not in self.data]
+        if not upserts and not deletes:
+            self.dirty_keys.clear()
+            self.deleted_keys.clear()
+            return 0
+
+        with self.backend.conn:
+            self.backend.conn.executemany(
+                f'INSERT INTO "{self.table}" (key, value) VALUES (?, ?) '
+                'ON CONFLICT (key) DO UPDATE SET value = excluded.value',
+                [(key, value) for key, value, _ in upserts]
+            )
+            self.backend.conn.executemany(
+                f'DELETE FROM "{self.table}" WHERE key = ?',
+                [(key,) for key in deletes]
+            )
+
+        for key, _, value_hash in upserts:
+            self.written[key] = value_hash
+        for key in deletes:
+            self.written.pop(key, None)
+        self.dirty_keys.clear()
+        self.deleted_keys.clear()
+        return len(upserts) + len(deletes)
+
+class LazyStore(UserDict):
+    """Dict-like proxy that reads its file on first access and can unload when idle."""
+
+    def __init__(self, file_name, idle_seconds):
+        # UserDict.__init__ would assign ``data`` and load the file eagerly
+        self.file_name = file_name
+        self.idle_seconds = idle_seconds
+        self.last_access = 0.0
+        self._data = None
+
+    @property
+    def data(self):
+        self.last_access = time.monotonic()
+        if self._data is None:
+            self._data = load_json(self.file_name)
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self.last_access = time.monotonic()
+        self._data = value
+
+    def is_loaded(self):
+        return self._data is not None
+
+    def unload_if_idle(self):
+        if self._data is not None and time.monotonic() - self.last_access >= self.idle_seconds:
+            self._data = None
+            return True
+        return False
+
+LEGACY_MESSAGE_FIELDS = ("daily_messages", "weekly_messages", "monthly_messages")
+
+def upgrade_message_counters(entry):
+    """Convert a member stats entry from the old reset-based counters."""
+    if not any(field in entry for field in LEGACY_MESSAGE_FIELDS):
+        return entry
+    daily = entry.get("daily_messages", 0)
+    entry = {field: value for field, value in entry.items() if field not in LEGACY_MESSAGE_FIELDS}
+    if not entry.get("message_days"):
+        today = date.today().toordinal()
+        days = [0] * MESSAGE_WINDOW_DAYS
+        if daily:
+            days[today % MESSAGE_WINDOW_DAYS] = daily
+            entry["last_message_day"] = today
+        entry["message_days"] = days
+    return entry
+
+def record_messages(stats, count, day=None):
+    """Add ``count`` messages to the ring bucket of ``day`` (default today)."""
+    day = day or date.today().toordinal()
+    days = stats.get("message_days") or [0] * MESSAGE_WINDOW_DAYS
+    last_day = stats.get("last_message_day", 0)
+    if day > last_day:
+        for stale in range(max(last_day + 1, day - MESSAGE_WINDOW_DAYS + 1), day + 1):
+            days[stale % MESSAGE_WINDOW_DAYS] = 0
+        stats["last_message_day"] = day
+    elif day <= last_day - MESSAGE_WINDOW_DAYS:
+        return
+    days[day % MESSAGE_WINDOW_DAYS] += count
+    stats["message_days"] = days
+
+def message_counts(stats, today=None):
+    """Messages today, this calendar week (from Monday) and this calendar month."""
+    today = today or date.today()
+    days = stats.get("message_days")
+    last_day = stats.get("last_message_day", 0)
+    if not days or not last_day:
+        return 0, 0, 0
+
+    def since(start):
+        first = max(start.toordinal(), last_day - MESSAGE_WINDOW_DAYS + 1)
+        return sum(days[day % MESSAGE_WINDOW_DAYS] for day in range(first, last_day + 1))
+
+    return (
+        since(today),
+        since(today - timedelta(days=today.weekday())),
+        since(today.replace(day=1)),
+    )
+
+class StatsRow(MutableMapping):
+    """Dict-like view of one member's row in a StatsTable."""
+
+    __slots__ = ("table", "user_id")
+
+    def __init__(self, table, user_id):
+        self.table = table
+        self.user_id = user_id
+
+    def __getitem__(self, field):
+        column = self.table.columns.get(field)
+        if column is None:
+            if field == StatsTable.DAYS_FIELD:
+                return self.table.get_days(self.table.row_of(self.user_id))
+            return self.table.extras[self.user_id][field]
+        return column[self.table.row_of(self.user_id)]
+
+    def __setitem__(self, field, value):
+        column = self.table.columns.get(field)
+        if column is None:
+            if field == StatsTable.DAYS_FIELD:
+                self.table.set_days(self.table.row_of(self.user_id), value)
+            else:
+                self.table.extras.setdefault(self.user_id, {})[field] = value
+        else:
+            column[self.table.row_of(self.user_id)] = int(value)
+
+    def __delitem__(self, field):
+        if field in self.table.columns or field == StatsTable.DAYS_FIELD:
+            raise KeyError(f"{field} is a fixed member stats column")
+        del self.table.extras[self.user_id][field]
+
+    def __iter__(self):
+        yield from self.table.FIELDS
+        yield self.table.DAYS_FIELD
+        yield from self.table.extras.get(self.user_id, ())
+
+    def __len__(self):
+        return len(self.table.FIELDS) + 1 + len(self.table.extras.get(self.user_id, ()))
+
+    def __repr__(self):
+        return f"StatsRow({dict(self)!r})"
+
+class StatsTable(MutableMapping):
+    """Member stats as parallel array columns, keyed by stringified user ID."""
+
+    FIELDS = ("xp", "all_time_messages", "last_message_day")
+    DAYS_FIELD = "message_days"
+    DAY_SLOTS = MESSAGE_WINDOW_DAYS
+    # Daily message counts fit comfortably in 32 bits; 8-byte slots would
+    # make the ring most of a member's footprint
+    DAY_TYPECODE = "I"
+
+    def __init__(self):
+        self.ids = array("q")
+        self.columns = {field: array("q") for field in self.FIELDS}
+        self.days = array(self.DAY_TYPECODE)
+        self.extras = {}
+
+    def get_days(self, row):
+        return self.days[row * self.DAY_SLOTS:(row + 1) * self.DAY_SLOTS].tolist()
+
+    def set_days(self, row, values):
+        slots = array(self.DAY_TYPECODE, values or ())
+        if len(slots) != self.DAY_SLOTS:
+            slots = array(self.DAY_TYPECODE, (list(slots) + [0] * self.DAY_SLOTS)[:self.DAY_SLOTS])
+        self.days[row * self.DAY_SLOTS:(row + 1) * self.DAY_SLOTS] = slots
+
+    def find(self, user_id):
+        """Row of ``user_id``, or -1 when the member has no row."""
+        row = bisect.bisect_left(self.ids, user_id)
+        if row < len(self.ids) and self.ids[row] == user_id:
+            return row
+        return -1
+
+    def row_of(self, user_id):
+        row = self.find(user_id)
+        if row < 0:
+            raise KeyError(str(user_id))
+        return row
+
+    def __getitem__(self, key):
+        user_id = int(key)
+        self.row_of(user_id)
+        return StatsRow(self, user_id)
+
+    def __setitem__(self, key, value):
+        user_id = int(key)
+        value = upgrade_message_counters(value)
+        row = bisect.bisect_left(self.ids, user_id)
+        if row == len(self.ids) or self.ids[row] != user_id:
+            # New members are rare next to updates, so a memmove is fine here
+            self.ids.insert(row, user_id)
+            for column in self.columns.values():
+                column.insert(row, 0)
+            self.days[row * self.DAY_SLOTS:row * self.DAY_SLOTS] = array(self.DAY_TYPECODE, [0]) * self.DAY_SLOTS
+
+        extras = {}
+        for field, field_value in value.items():
+            column = self.columns.get(field)
+            if column is None:
+                if field != self.DAYS_FIELD:
+                    extras[field] = field_value
+            else:
+                column[row] = int(field_value or 0)
+        for field in self.FIELDS:
+            if field not in value:
+                self.columns[field][row] = 0
+        self.set_days(row, value.get(self.DAYS_FIELD))
+        if extras:
+            self.extras[user_id] = extras
+        else:
+            self.extras.pop(user_id, None)
+
+    def __delitem__(self, key):
+        user_id = int(key)
+        row = self.row_of(user_id)
+        del self.ids[row]
+        for column in self.columns.values():
+            del column[row]
+        del self.days[row * self.DAY_SLOTS:(row + 1) * self.DAY_SLOTS]
+        self.extras.pop(user_id, None)
+
+    def update(self, other=(), **kwargs):
+        items = list(other.items() if hasattr(other, "items") else other) + list(kwargs.items())
+        if len(items) < 64:
+            for key, value in items:
+                self[key] = value
+            return
+
+        # Bulk path (startup, restores): rebuild the columns in one sorted pass
+        rows = {int(key): dict(self[key]) for key in self}
+        for key, value in items:
+            rows[int(key)] = value
+        self.clear()
+        empty_days = [0] * self.DAY_SLOTS
+        for user_id in sorted(rows):
+            value = upgrade_message_counters(rows[user_id])
+            self.ids.append(user_id)
+            extras = {}
+            for field, field_value in value.items():
+                if field not in self.columns and field != self.DAYS_FIELD:
+                    extras[field] = field_value
+            for field, column in self.columns.items():
+                column.append(int(value.get(field) or 0))
+            self.days.extend(((value.get(self.DAYS_FIELD) or []) + empty_days)[:self.DAY_SLOTS])
+            if extras:
+                self.extras[user_id] = extras
+
+    def clear(self):
+        self.ids = array("q")
+        self.columns = {field: array("q") for field in self.FIELDS}
+        self.days = array(self.DAY_TYPECODE)
+        self.extras = {}
+
+    def __contains__(self, key):
+        try:
+            return self.find(int(key)) >= 0
+        except (TypeError, ValueError):
+            return False
+
+    def __iter__(self):
+        for user_id in self.ids.tolist():
+            yield str(user_id)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def snapshot(self, keys=None):
+        """Plain ``{uid: {field: value}}`` copy for serialization."""
+        if keys is None:
+            rows = range(len(self.ids))
+        else:
+            rows = [row for row in (self.find(int(key)) for key in keys) if row >= 0]
+        columns = list(self.columns.items())
+        snapshot = {}
+        for row in rows:
+            user_id = self.ids[row]
+            entry = {field: column[row] for field, column in columns}
+            entry[self.DAYS_FIELD] = self.get_days(row)
+            if user_id in self.extras:
+                entry.update(self.extras[user_id])
+            snapshot[str(user_id)] = entry
+        return snapshot
+
+class ShardedStore(UserDict):
+    """Dict-like store persisted as N shard files keyed by a hash of the key."""
+
+    def __init__(self, file_name, shard_count, shard_dir, data=None):
+        super().__init__()
+        if data is not None:
+            self.data = data
+        self.file_name = file_name
+        self.directory = os.path.join(shard_dir, os.path.splitext(os.path.basename(file_name))[0])
+        self.shard_count = shard_count
+        self.shard_keys = []
+        self.dirty_shards = set()
+
+    def shard_of(self, key):
+        return zlib.crc32(str(key).encode("utf-8")) % self.shard_count
+
+    def shard_path(self, index):
+        return os.path.join(self.directory, f"shard_{index:03d}.json")
+
+    def layout_path(self):
+        # Written only once every shard is on disk, so its presence means the
+        # shard set is complete and the single source file can be ignored
+        return os.path.join(self.directory, "layout.json")
+
+    def load(self):
+        existing = []
+        if os.path.isdir(self.directory):
+            existing = sorted(f for f in os.listdir(self.directory) if f.startswith("shard_") and f.endswith(".json"))
+
+        layout = load_json(self.layout_path())
+        if layout:
+            on_disk_count = layout["shard_count"]
+        else:
+            # Without the marker the highest shard may be missing too, so only
+            # ever grow the configured count from what is on disk
+            on_disk_count = max(self.shard_count, int(existing[-1][6:9]) + 1 if existing else 0)
+        if on_disk_count != self.shard_count:
+            logger.warning(f"{self.file_name} has {on_disk_count} shards on disk; keeping that layout")
+            self.shard_count = on_disk_count
+        self.shard_keys = [set() for _ in range(self.shard_count)]
+
+        paths = [self.shard_path(i) for i in range(self.shard_count)]
+        complete = bool(layout) or all(os.path.exists(path) for path in paths)
+        if complete:
+            with ThreadPoolExecutor(max_workers=min(8, self.shard_count)) as executor:
+                shards = list(executor.map(load_json, paths))
+        else:
+            # First start after switching to shards, or a split that was
+            # interrupted: start from the single file and let any shards that
+            # did get written override it
+            shards = [load_json(path) if os.path.exists(path) else {} for path in paths]
+
+        merged = {}
+        if not complete:
+            source = self.file_name if os.path.exists(self.file_name) else self.archive_path()
+            merged = load_json(source)
+        for shard in shards:
+            merged.update(shard)
+        self.update(merged)
+        self.dirty_shards = set()
+
+        if not layout:
+            self.write_all()
+        else:
+            self.archive_source()
+        return self
+
+    def write_all(self):
+        """Write every shard durably, then the layout marker; runs at startup."""
+        os.makedirs(self.directory, exist_ok=True)
+        for index in range(self.shard_count):
+            dump_store_file(self.shard_path(index), self.shard_snapshot(index))
+        write_file_atomic(self.layout_path(), json.dumps({"shard_count": self.shard_count}).encode("utf-8"))
+        logger.info(f"Wrote {self.shard_count} shards for {self.file_name}")
+        self.archive_source()
+
+    def archive_path(self):
+        return os.path.join(self.directory, "unsharded.json")
+
+    def archive_source(self):
+        """Move the single source file aside once the shards have replaced it."""
+        if os.path.exists(self.file_name):
+            os.replace(self.file_name, self.archive_path())
+            logger.info(f"Moved {self.file_name} to {self.archive_path()}; the shards are now the only copy in use")
+
+    def __setitem__(self, key, value):
+        self.data[key] = value
+        index = self.shard_of(key)
+        self.shard_keys[index].add(key)
+        self.dirty_shards.add(index)
+
+    def __delitem__(self, key):
+        del self.data[key]
+        index = self.shard_of(key)
+        self.shard_keys[index].discard(key)
+        self.dirty_shards.add(index)
+
+    def update(self, other=(), **kwargs):
+        items = dict(other, **kwargs)
+        for key in items:
+            index = self.shard_of(key)
+            self.shard_keys[index].add(key)
+            self.dirty_shards.add(index)
+        self.data.update(items)
+
+    def clear(self):
+        self.data.clear()
+        for keys in self.shard_keys:
+            keys.clear()
+        self.dirty_shards.update(range(self.shard_count))
+
+    def touch(self, *keys):
+        self.dirty_shards.update(self.shard_of(key) for key in keys)
+
+    def shard_snapshot(self, index):
+        if isinstance(self.data, StatsTable):
+            return self.data.snapshot(self.shard_keys[index])
+        return {key: self.data[key] for key in self.shard_keys[index]}
+
+    def take_dirty(self, keys=None):
+        if keys is None:
+            shards = set(range(self.shard_count))
+        else:
+            shards = self.dirty_shards | {self.shard_of(key) for key in keys}
+        self.dirty_shards = set()
+        return sorted(shards)
+
+    def flush(self, keys=None):
+        """Write the dirty shards; without ``keys`` every shard is rewritten."""
+        shards = self.take_dirty(keys)
+        for index in shards:
+            save_json(self.shard_path(index), self.shard_snapshot(index))
+        return len(shards)
+
+    async def save(self):
+        """Write every shard and wait until they are all on disk."""
+        saved = True
+        for index in self.take_dirty():
+            saved = await store_writer.save(self.shard_path(index), self.shard_snapshot(index)) and saved
+        return saved
+
+sqlite_backend = SQLiteBackend(SQLITE_DB_PATH) if STORAGE_BACKEND == "sqlite" else None
+
+def load_store(file_name):
+    if sqlite_backend:
+        return sqlite_backend.open_store(file_name)
+    if file_name in SHARDED_STORES:
+        table = StatsTable() if file_name == "member_stats.json" else None
+        return ShardedStore(file_name, STORE_SHARD_COUNT, STORE_SHARD_DIR, data=table).load()
+    if file_name in LAZY_STORES:
+        return LazyStore(file_name, LAZY_STORE_IDLE_SECONDS)
+    return load_json(file_name)
+
+class PersistenceManager:
+    """Write-behind persistence for the data stores."""
+
+    def __init__(self):
+        self.stores = {}
+        # file name -> set of touched keys, or None when the whole store changed
+        self.dirty = {}
+
+    def register(self, file_name, data):
+        self.stores[file_name] = data
+        return data
+
+    def mark_dirty(self, *file_names):
+        for file_name in file_names:
+            self.dirty[file_name] = None
+
+    def touch(self, file_name, *keys):
+        """Mark individual entries of a store as changed."""
+        if file_name in self.dirty and self.dirty[file_name] is None:
+            return
+        self.dirty.setdefault(file_name, set()).update(keys)
+
+    def flush(self):
+        if not self.dirty:
+            return 0
+
+        dirty, self.dirty = self.dirty, {}
+        for file_name, keys in dirty.items():
+            try:
+                data = self.stores[file_name]
+                if isinstance(data, LazyStore) and not data.is_loaded():
+                    # Never loaded (or unloaded while clean), so nothing changed
+                    continue
+                if isinstance(data, (SQLiteStore, ShardedStore)):
+                    data.flush(keys)
+                else:
+                    save_json(file_name, data)
+            except Exception as e:
+                logger.error(f"Failed to save {file_name}: {e}")
+                self.mark_dirty(file_name)
+        return len(dirty)
+
+    def save_all(self):
+        self.mark_dirty(*self.stores)
+        return self.flush()
+
+    async def save_durable(self, *file_names):
+        """Write the given stores (default: all) and wait until they are on disk."""
+        saved = True
+        for file_name in file_names or list(self.stores):
+            self.dirty.pop(file_name, None)
+            data = self.stores[file_name]
+            if isinstance(data, LazyStore) and not data.is_loaded():
+                continue
+            try:
+                if isinstance(data, SQLiteStore):
+                    data.flush()
+                elif isinstance(data, ShardedStore):
+                    saved = await data.save() and saved
+                else:
+                    saved = await store_writer.save(file_name, data) and saved
+            except Exception as e:
+                logger.error(f"Failed to save {file_name}: {e}")
+                self.mark_dirty(file_name)
+                saved = False
+        return saved
+
+    def unload_idle(self):
+        unloaded = []
+        for file_name, data in self.stores.items():
+            if not isinstance(data, LazyStore):
+                continue
+            # Pending writes still need the in-memory copy
+            if file_name in self.dirty or file_name in store_writer.unwritten:
+                continue
+            if data.unload_if_idle():
+                unloaded.append(file_name)
+        return unloaded
+
+persistence = PersistenceManager()
+
+persistence.register("bot_config.json", BOT_CONFIG)
+tier_data = persistence.register("tierlist.json", load_store("tierlist.json"))
+member_stats = persistence.register("member_stats.json", load_store("member_stats.json"))
+shops_data = persistence.register("shops.json", load_store("shops.json"))
+user_balances = persistence.register("balances.json", load_store("balances.json"))
+user_inventories = persistence.register("inventories.json", load_store("inventories.json"))
+reaction_roles = persistence.register("reaction_roles.json", load_store("reaction_roles.json"))
+sticky_messages = persistence.register("sticky_messages.json", load_store("sticky_messages.json"))
+server_settings = persistence.register("server_settings.json", load_store("server_settings.json"))
+verification_data = persistence.register("verification.json", load_store("verification.json"))
+user_profiles = persistence.register("user_profiles.json", load_store("user_profiles.json"))
+giveaways_data = persistence.register("giveaways.json", load_store("giveaways.json"))
+auction_data = persistence.register("auctions.json", load_store("auctions.json"))
+premium_slots = persistence.register("premium_slots.json", load_store("premium_slots.json"))
+logging_settings = persistence.register("logging_settings.json", load_store("logging_settings.json"))
+member_warnings = persistence.register("member_warnings.json", load_store("member_warnings.json"))
+autoresponders = persistence.register("autoresponders.json", load_store("autoresponders.json"))
+profile_presets = persistence.register("profile_presets.json", load_store("profile_presets.json"))
 
 def save_all():
-    save_json("bot_config.json", BOT_CONFIG)
-    save_json("tierlist.json", tier_data)
-    save_json("member_stats.json", member_stats)
-    save_json("shops.json", shops_data)
-    save_json("balances.json", user_balances)
-    save_json("inventories.json", user_inventories)
-    save_json("reaction_roles.json", reaction_roles)
-    save_json("sticky_messages.json", sticky_messages)
-    save_json("server_settings.json", server_settings)
-    save_json("verification.json", verification_data)
-    save_json("auctions.json", auction_data)
-    save_json("user_profiles.json", user_profiles)
-    save_json("giveaways.json", giveaways_data)
-    save_json("premium_slots.json", premium_slots)
-    save_json("logging_settings.json", logging_settings)
-    save_json("member_warnings.json", member_warnings)
-    save_json("autoresponders.json", autoresponders)
-    save_json("profile_presets.json", profile_presets)
+    persistence.save_all()
+
+class EconomyJournal:
+    """Append-only journal of balance and inventory changes."""
+
+    def __init__(self, path, archive_dir, compact_bytes):
+        self.path = path
+        self.rotated_path = f"{path}.1"
+        self.archive_dir = archive_dir
+        self.compact_bytes = compact_bytes
+        self.file = None
+        self.size = os.path.getsize(path) if os.path.exists(path) else 0
+        self.compaction_task = None
+
+    def replay(self):
+        applied = 0
+        for path in (self.rotated_path, self.path):
+            if not os.path.exists(path):
+                continue
+            with open(path, "r") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A torn final line from a crash mid-append
+                        logger.warning(f"Skipping unreadable economy journal entry in {path}")
+                        continue
+                    self.apply(record)
+                    applied += 1
+
+        if applied:
+            logger.info(f"Replayed {applied} economy journal entries")
+        return applied
+
+    @staticmethod
+    def apply(record):
+        user_id = record["user_id"]
+        if record["type"] == "balance":
+            user_balances[user_id] = record["balance"]
+        elif record["type"] == "item":
+            if user_id not in user_inventories:
+                user_inventories[user_id] = {}
+            user_inventories[user_id][record["item"]] = record["quantity"]
+
+    def append(self, record):
+        record["timestamp"] = int(time.time())
+        line = json.dumps(record) + "\n"
+        if self.file is None:
+            self.file = open(self.path, "a")
+        self.file.write(line)
+        self.file.flush()
+        self.size += len(line)
+
+        if self.size >= self.compact_bytes and not self.compaction_task:
+            try:
+                self.compaction_task = asyncio.get_running_loop().create_task(self.compact())
+            except RuntimeError:
+                pass
+
+    async def compact(self):
+        try:
+            # Rotate first so new changes keep landing in a fresh journal
+            # while the snapshot is written.
+            if not os.path.exists(self.rotated_path):
+                if self.file:
+                    self.file.close()
+                    self.file = None
+                os.replace(self.path, self.rotated_path)
+                self.size = 0
+
+            if not await persistence.save_durable(*ECONOMY_STORES):
+                logger.error("Economy snapshot failed; keeping rotated journal for replay")
+                return
+
+            archive_name = self.archive(self.rotated_path)
+            logger.info(f"Compacted economy journal into snapshot, archived as {archive_name}")
+        except Exception as e:
+            logger.error(f"Economy journal compaction failed: {e}")
+        finally:
+            self.compaction_task = None
+
+    def archive(self, path):
+        os.makedirs(self.archive_dir, exist_ok=True)
+        archive_name = f"economy_journal_{datetime.now().strftime('%Y%m%d_%H%M%S')}{'_rotated' if path == self.rotated_path else ''}.log"
+        os.replace(path, os.path.join(self.archive_dir, archive_name))
+        return archive_name
+
+    def reset(self):
+        """Archive the whole journal once the snapshot it applies to is replaced."""
+        self.close()
+        for path in (self.rotated_path, self.path):
+            if os.path.exists(path):
+                self.archive(path)
+        self.size = 0
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+economy_journal = EconomyJournal(ECONOMY_JOURNAL_FILE, ECONOMY_JOURNAL_ARCHIVE_DIR, ECONOMY_JOURNAL_COMPACT_BYTES)
+economy_journal.replay()
+
+def adjust_balance(user_id: str, delta: int, reason: str, **details):
+    new_balance = user_balances.get(user_id, 0) + delta
+    user_balances[user_id] = new_balance
+    leaderboards["balance"].update(user_id, new_balance)
+    economy_journal.append({"type": "balance", "user_id": user_id, "delta": delta, "balance": new_balance, "reason": reason, **details})
+    return new_balance
+
+def adjust_inventory(user_id: str, item_name: str, delta: int, reason: str, **details):
+    if user_id not in user_inventories:
+        user_inventories[user_id] = {}
+    quantity = user_inventories[user_id].get(item_name, 0) + delta
+    user_inventories[user_id][item_name] = quantity
+    economy_journal.append({"type": "item", "user_id": user_id, "item": item_name, "delta": delta, "quantity": quantity, "reason": reason, **details})
+    return quantity
+
+class ParticipantLog:
+    """Per-giveaway append-only log of joins, replayed at startup."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.files = {}
+
+    def path(self, giveaway_id):
+        return os.path.join(self.directory, f"{giveaway_id}.log")
+
+    def replay(self):
+        if not os.path.isdir(self.directory):
+            return 0
+        applied = 0
+        for file_name in os.listdir(self.directory):
+            if not file_name.endswith(".log"):
+                continue
+            giveaway_id = file_name[:-4]
+            giveaway = giveaways_data.get(giveaway_id)
+            if giveaway is None:
+                logger.warning(f"Participant log for unknown giveaway {giveaway_id}; leaving it in place")
+                continue
+            with open(self.path(giveaway_id), "r") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        logger.warning(f"Skipping unreadable participant log entry for giveaway {giveaway_id}")
+                        continue
+                    giveaway["participants"][record["user_id"]] = {"entries": record["entries"]}
+                    applied += 1
+            persistence.touch("giveaways.json", giveaway_id)
+
+        if applied:
+            logger.info(f"Replayed {applied} giveaway joins")
+        return applied
+
+    def append(self, giveaway_id, user_id, entries):
+        file = self.files.get(giveaway_id)
+        if file is None:
+            os.makedirs(self.directory, exist_ok=True)
+            file = self.files[giveaway_id] = open(self.path(giveaway_id), "a")
+        file.write(json.dumps({"user_id": user_id, "entries": entries, "timestamp": int(time.time())}) + "\n")
+        file.flush()
+
+    def remove(self, giveaway_id):
+        file = self.files.pop(giveaway_id, None)
+        if file:
+            file.close()
+        try:
+            os.remove(self.path(giveaway_id))
+        except FileNotFoundError:
+            pass
+
+    def close(self):
+        for file in self.files.values():
+            file.close()
+        self.files = {}
+
+    def clear(self):
+        """Drop every join log once giveaways.json has been replaced wholesale."""
+        self.close()
+        if not os.path.isdir(self.directory):
+            return
+        for file_name in os.listdir(self.directory):
+            if file_name.endswith(".log"):
+                os.remove(os.path.join(self.directory, file_name))
+
+participant_log = ParticipantLog(GIVEAWAY_LOG_DIR)
+participant_log.replay()
 
 # --------- Helper Functions -----------
 
@@ -163,15 +1292,778 @@ def ensure_user_in_stats(user_id: str):
     if user_id not in member_stats:
         member_stats[user_id] = {
             "xp": 0,
-            "daily_messages": 0,
-            "weekly_messages": 0,
-            "monthly_messages": 0,
             "all_time_messages": 0,
+            "last_message_day": 0,
+            "message_days": [0] * MESSAGE_WINDOW_DAYS,
         }
+        persistence.touch("member_stats.json", user_id)
     if user_id not in user_balances:
         user_balances[user_id] = 0
+        persistence.touch("balances.json", user_id)
     if user_id not in user_inventories:
         user_inventories[user_id] = {}
+        persistence.touch("inventories.json", user_id)
+
+class StatsAccumulator:
+    """Buffers message counts and XP per member until the next merge."""
+
+    def __init__(self, max_pending):
+        self.max_pending = max_pending
+        # uid -> [messages, xp, stored xp when the entry was created]
+        self.pending = {}
+
+    def add(self, user_id: str, messages: int, xp: int):
+        """Buffer a delta; returns the member's (old_xp, new_xp)."""
+        entry = self.pending.get(user_id)
+        if entry is None:
+            stored_xp = member_stats[user_id]["xp"] if user_id in member_stats else 0
+            entry = self.pending[user_id] = [0, 0, stored_xp]
+
+        old_xp = entry[2] + entry[1]
+        entry[0] += messages
+        entry[1] += xp
+
+        if len(self.pending) >= self.max_pending:
+            self.merge()
+        return old_xp, old_xp + xp
+
+    def clear(self):
+        self.pending = {}
+
+    def merge_user(self, user_id: str):
+        entry = self.pending.pop(user_id, None)
+        if entry is not None:
+            self.apply(user_id, entry)
+            persistence.touch("member_stats.json", user_id)
+
+    def merge(self):
+        if not self.pending:
+            return 0
+
+        pending, self.pending = self.pending, {}
+        for user_id, entry in pending.items():
+            self.apply(user_id, entry)
+        persistence.touch("member_stats.json", *pending)
+        return len(pending)
+
+    @staticmethod
+    def apply(user_id, entry):
+        messages, xp, _ = entry
+        ensure_user_in_stats(user_id)
+        stats = member_stats[user_id]
+        if messages:
+            if isinstance(stats, dict):
+                upgraded = upgrade_message_counters(stats)
+                if upgraded is not stats:
+                    stats.clear()
+                    stats.update(upgraded)
+            record_messages(stats, messages)
+            stats["all_time_messages"] += messages
+            leaderboards["messages"].update(user_id, stats["all_time_messages"])
+        if xp:
+            stats["xp"] += xp
+            leaderboards["xp"].update(user_id, stats["xp"])
+
+stats_accumulator = StatsAccumulator(STATS_MAX_PENDING_MEMBERS)
+
+# --------- Leaderboards -----------
+
+class SkipListNode:
+    __slots__ = ("key", "next", "width")
+
+    def __init__(self, key, next, width):
+        self.key = key
+        self.next = next
+        self.width = width
+
+class IndexableSkipList:
+    """Sorted keys with O(log n) insert, remove, rank and positional lookup."""
+
+    MAX_LEVELS = 24
+    END = SkipListNode((math.inf,), [], [])
+
+    def __init__(self):
+        self.size = 0
+        self.head = SkipListNode(None, [self.END] * self.MAX_LEVELS, [1] * self.MAX_LEVELS)
+
+    def __len__(self):
+        return self.size
+
+    def insert(self, key):
+        chain = [None] * self.MAX_LEVELS
+        steps_at_level = [0] * self.MAX_LEVELS
+        node = self.head
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level].key <= key:
+                steps_at_level[level] += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+
+        height = min(self.MAX_LEVELS, 1 - int(math.log(1.0 - random.random(), 2.0)))
+        new_node = SkipListNode(key, [None] * height, [None] * height)
+        steps = 0
+        for level in range(height):
+            previous = chain[level]
+            new_node.next[level] = previous.next[level]
+            previous.next[level] = new_node
+            new_node.width[level] = previous.width[level] - steps
+            previous.width[level] = steps + 1
+            steps += steps_at_level[level]
+        for level in range(height, self.MAX_LEVELS):
+            chain[level].width[level] += 1
+        self.size += 1
+
+    def remove(self, key):
+        chain = [None] * self.MAX_LEVELS
+        node = self.head
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level].key < key:
+                node = node.next[level]
+            chain[level] = node
+        target = chain[0].next[0]
+        if target.key != key:
+            raise KeyError(key)
+
+        for level in range(len(target.next)):
+            previous = chain[level]
+            previous.width[level] += target.width[level] - 1
+            previous.next[level] = target.next[level]
+        for level in range(len(target.next), self.MAX_LEVELS):
+            chain[level].width[level] -= 1
+        self.size -= 1
+
+    def index(self, key):
+        """0-based position of ``key``; raises KeyError if it is missing."""
+        position = 0
+        node = self.head
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level].key < key:
+                position += node.width[level]
+                node = node.next[level]
+        if node.next[0].key != key:
+            raise KeyError(key)
+        return position
+
+    def slice(self, start, count):
+        """Up to ``count`` keys starting at position ``start``."""
+        if start >= self.size or count <= 0:
+            return []
+        node = self.head
+        remaining = start + 1
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.width[level] <= remaining:
+                remaining -= node.width[level]
+                node = node.next[level]
+        keys = []
+        while node is not self.END and len(keys) < count:
+            keys.append(node.key)
+            node = node.next[0]
+        return keys
+
+class Leaderboard:
+    """Members ranked by one stat, highest first, ties broken by user ID."""
+
+    def __init__(self, title, unit, source):
+        self.title = title
+        self.unit = unit
+        self.source = source
+        self.ranks = None
+        self.keys = {}
+        # Updates made while a rebuild runs, replayed onto the new ranking
+        self.replay = None
+        self.rebuild_task = None
+
+    @staticmethod
+    def insert_items(ranks, keys, items):
+        for user_id, value in items:
+            if value:
+                key = (-int(value), int(user_id))
+                keys[user_id] = key
+                ranks.insert(key)
+
+    def build(self):
+        """Build the ranking in one go; used at startup, before the loop runs."""
+        self.ranks, self.keys = IndexableSkipList(), {}
+        self.insert_items(self.ranks, self.keys, self.source())
+
+    def ensure(self):
+        if self.ranks is None:
+            self.build()
+
+    async def rebuild(self):
+        """Rebuild from the store in chunks, yielding to the loop between them."""
+        items = list(self.source())
+        ranks, keys = IndexableSkipList(), {}
+        replay = self.replay = {}
+        try:
+            for start in range(0, len(items), LEADERBOARD_BUILD_CHUNK):
+                self.insert_items(ranks, keys, items[start:start + LEADERBOARD_BUILD_CHUNK])
+                await asyncio.sleep(0)
+        finally:
+            # A newer rebuild may already have installed its own buffer
+            if self.replay is replay:
+                self.replay = None
+        self.ranks, self.keys = ranks, keys
+        for user_id, value in replay.items():
+            self.update(user_id, value)
+
+    def schedule_rebuild(self):
+        if self.rebuild_task is not None:
+            self.rebuild_task.cancel()
+        try:
+            self.rebuild_task = asyncio.get_running_loop().create_task(self.rebuild())
+        except RuntimeError:
+            self.rebuild_task = None
+            self.build()
+
+    def update(self, user_id, value):
+        if self.replay is not None:
+            self.replay[user_id] = value
+        if self.ranks is None:
+            return
+        old_key = self.keys.pop(user_id, None)
+        new_key = (-int(value), int(user_id)) if value else None
+        if old_key == new_key:
+            if new_key is not None:
+                self.keys[user_id] = new_key
+            return
+        if old_key is not None:
+            self.ranks.remove(old_key)
+        if new_key is not None:
+            self.ranks.insert(new_key)
+            self.keys[user_id] = new_key
+
+    def __len__(self):
+        self.ensure()
+        return len(self.ranks)
+
+    def rank(self, user_id):
+        """1-based rank of the member, or None if unranked."""
+        self.ensure()
+        key = self.keys.get(user_id)
+        return None if key is None else self.ranks.index(key) + 1
+
+    def page(self, offset, limit):
+        self.ensure()
+        return [(str(user_id), -negated) for negated, user_id in self.ranks.slice(offset, limit)]
+
+def member_stat_values(field):
+    table = getattr(member_stats, "data", None)
+    if isinstance(table, StatsTable):
+        return zip(map(str, table.ids), table.columns[field])
+    return ((user_id, stats.get(field, 0)) for user_id, stats in member_stats.items())
+
+leaderboards = {
+    "xp": Leaderboard("XP", "XP", lambda: member_stat_values("xp")),
+    "messages": Leaderboard("Messages", "messages", lambda: member_stat_values("all_time_messages")),
+    "balance": Leaderboard("Balance", "", lambda: user_balances.items()),
+}
+
+for board in leaderboards.values():
+    board.build()
+
+def reset_leaderboards():
+    for leaderboard in leaderboards.values():
+        leaderboard.schedule_rebuild()
+
+# --------- Activity Analytics -----------
+
+class LRUCache:
+    """Small least-recently-used cache."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+        self.misses += 1
+        return default
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+class ActivityDay:
+    """One day of activity as sorted fixed-width columns."""
+
+    __slots__ = ("day", "user_ids", "counts", "channel_ids", "channel_counts", "total")
+
+    HEADER = struct.Struct("<4sBII")
+    MAGIC = b"TBKA"
+
+    def __init__(self, day, user_ids, counts, channel_ids, channel_counts):
+        self.day = day
+        self.user_ids = user_ids
+        self.counts = counts
+        self.channel_ids = channel_ids
+        self.channel_counts = channel_counts
+        self.total = sum(counts)
+
+    @classmethod
+    def from_counts(cls, day, users, channels):
+        user_ids = sorted(users)
+        channel_ids = sorted(channels)
+        return cls(
+            day,
+            array("q", user_ids), array("I", (users[u] for u in user_ids)),
+            array("q", channel_ids), array("I", (channels[c] for c in channel_ids))
+        )
+
+    def to_bytes(self):
+        header = self.HEADER.pack(self.MAGIC, 1, len(self.user_ids), len(self.channel_ids))
+        return b"".join((header, self.user_ids.tobytes(), self.counts.tobytes(),
+                         self.channel_ids.tobytes(), self.channel_counts.tobytes()))
+
+    @classmethod
+    def from_bytes(cls, day, payload):
+        magic, version, user_count, channel_count = cls.HEADER.unpack_from(payload)
+        if magic != cls.MAGIC or version != 1:
+            raise ValueError("not an activity file")
+        columns = []
+        offset = cls.HEADER.size
+        for typecode, length in (("q", user_count), ("I", user_count), ("q", channel_count), ("I", channel_count)):
+            column = array(typecode)
+            size = column.itemsize * length
+            column.frombytes(payload[offset:offset + size])
+            offset += size
+            columns.append(column)
+        return cls(day, *columns)
+
+class ActivityHistory:
+    """Per-member, per-day message counts kept as one ActivityDay per date."""
+
+    def __init__(self, directory, retention_days):
+        self.directory = directory
+        self.retention_days = retention_days
+        self.days = {}
+        self.today = date.today().toordinal()
+        self.today_users = {}
+        self.today_channels = {}
+        self.today_snapshot = None
+        self.dirty = False
+        self.generation = 0
+        self.last_flush = time.monotonic()
+        self.results = LRUCache(64)
+        os.makedirs(directory, exist_ok=True)
+        self.load_today()
+
+    def path(self, day):
+        return os.path.join(self.directory, f"{date.fromordinal(day).isoformat()}.bin")
+
+    def load_today(self):
+        stored = self.read_day(self.today)
+        if stored is not None:
+            self.today_users = dict(zip(stored.user_ids, stored.counts))
+            self.today_channels = dict(zip(stored.channel_ids, stored.channel_counts))
+
+    def read_day(self, day):
+        """Read one day's file; touches no shared state, so it can run in a worker."""
+        try:
+            with open(self.path(day), "rb") as f:
+                return ActivityDay.from_bytes(day, f.read())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, struct.error) as e:
+            logger.error(f"Could not read activity for {date.fromordinal(day)}: {e}")
+            return None
+
+    def write_day(self, day, payload):
+        # Shares the store writer so two writes never race on the same file
+        save_json(self.path(day), payload)
+
+    def record(self, user_id, channel_id, count=1):
+        day = date.today().toordinal()
+        if day != self.today:
+            self.roll_over(day)
+        self.today_users[user_id] = self.today_users.get(user_id, 0) + count
+        self.today_channels[channel_id] = self.today_channels.get(channel_id, 0) + count
+        self.today_snapshot = None
+        self.dirty = True
+
+    def roll_over(self, day):
+        finished = self.snapshot_today()
+        if self.dirty:
+            self.write_day(self.today, finished.to_bytes())
+            self.dirty = False
+        self.days[self.today] = finished
+        self.today = day
+        self.today_users, self.today_channels = {}, {}
+        self.today_snapshot = None
+        self.prune()
+
+    def run_io(self, func, *args):
+        """Run file cleanup in the executor from the loop, or inline without one."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            func(*args)
+            return
+        loop.run_in_executor(None, func, *args).add_done_callback(self.log_io_failure)
+
+    @staticmethod
+    def log_io_failure(future):
+        if not future.cancelled() and future.exception() is not None:
+            logger.error(f"Activity file operation failed: {future.exception()}")
+
+    def prune(self):
+        cutoff = self.today - self.retention_days
+        for day in [d for d in self.days if d < cutoff]:
+            del self.days[day]
+        self.run_io(self.remove_files_before, cutoff)
+
+    def remove_files_before(self, cutoff):
+        if not os.path.isdir(self.directory):
+            return
+        for file_name in os.listdir(self.directory):
+            try:
+                day = date.fromisoformat(file_name[:-4]).toordinal()
+            except ValueError:
+                continue
+            if day < cutoff:
+                os.remove(os.path.join(self.directory, file_name))
+
+    def snapshot_today(self):
+        if self.today_snapshot is None:
+            self.today_snapshot = ActivityDay.from_counts(self.today, self.today_users, self.today_channels)
+        return self.today_snapshot
+
+    def flush(self):
+        """Write today's counts if they changed; used once the loop is gone."""
+        self.last_flush = time.monotonic()
+        if not self.dirty:
+            return
+        self.write_day(self.today, self.snapshot_today().to_bytes())
+        self.dirty = False
+        self.generation += 1
+
+    async def save(self):
+        """Write today's counts from the executor if they changed; past days never change."""
+        self.last_flush = time.monotonic()
+        if not self.dirty:
+            return
+        day, payload = self.today, self.snapshot_today().to_bytes()
+        # Anything recorded while the write runs marks it dirty again
+        self.dirty = False
+        if not await store_writer.save(self.path(day), payload):
+            self.dirty = True
+            return
+        self.generation += 1
+
+    async def save_if_due(self):
+        if time.monotonic() - self.last_flush >= ACTIVITY_FLUSH_SECONDS:
+            await self.save()
+
+    async def summary(self, start: date, end: date):
+        """Activity figures for the inclusive range ``start``..``end``."""
+        first, last = start.toordinal(), end.toordinal()
+        key = (first, last, self.generation if last >= self.today else 0)
+        cached = self.results.get(key)
+        if cached is not None:
+            return cached
+
+        # The worker gets its own dict of immutable ActivityDays, so it never
+        # touches self.days while the loop is pruning or rolling over
+        length = last - first + 1
+        days = {day: self.days[day] for day in range(first - length, last + 1) if day in self.days}
+        if first - length <= self.today <= last:
+            days[self.today] = self.snapshot_today()
+        result, loaded = await asyncio.get_running_loop().run_in_executor(
+            None, self.build_summary, start, end, days
+        )
+        # Only past days are immutable; skip ones the loop filled in or pruned meanwhile
+        cutoff = self.today - self.retention_days
+        for day, activity in loaded.items():
+            if cutoff <= day < self.today and day not in self.days:
+                self.days[day] = activity
+        self.results.put(key, result)
+        return result
+
+    def build_summary(self, start, end, days):
+        """Return (summary, days it read) for the range, reading missing day files."""
+        first, last = start.toordinal(), end.toordinal()
+        length = last - first + 1
+        loaded = {}
+        for day in range(first - length, last + 1):
+            if day not in days:
+                days[day] = loaded[day] = self.read_day(day)
+
+        def active_users(range_start, range_end):
+            users = set()
+            for day in range(range_start, range_end + 1):
+                if days[day] is not None:
+                    users.update(days[day].user_ids)
+            return users
+
+        daily_totals = []
+        channels = {}
+        for day in range(first, last + 1):
+            activity = days[day]
+            if activity is None:
+                daily_totals.append(0)
+                continue
+            daily_totals.append(activity.total)
+            for channel_id, count in zip(activity.channel_ids, activity.channel_counts):
+                channels[channel_id] = channels.get(channel_id, 0) + count
+
+        active = active_users(first, last)
+        previous = active_users(first - length, first - 1)
+        retention = len(previous & active) / len(previous) if previous else None
+        busiest = max(range(length), key=daily_totals.__getitem__)
+
+        result = {
+            "start": start,
+            "end": end,
+            "messages": sum(daily_totals),
+            "active_users": len(active),
+            "previous_active_users": len(previous),
+            "retention": retention,
+            "daily_totals": daily_totals,
+            "busiest_day": (date.fromordinal(first + busiest), daily_totals[busiest]),
+            "top_channels": heapq.nlargest(5, channels.items(), key=lambda item: item[1]),
+        }
+        return result, loaded
+
+activity_history = ActivityHistory(ACTIVITY_DIR, ACTIVITY_RETENTION_DAYS)
+
+# --------- Chart Rendering -----------
+
+CHART_SIZE = (900, 450)
+CHART_MARGIN = (70, 50, 30, 60)  # left, top, right, bottom
+
+def chart_canvas(title):
+    image = Image.new("RGB", CHART_SIZE, (47, 49, 54))
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default()
+    draw.text((CHART_MARGIN[0], 15), title, fill=(255, 255, 255), font=font)
+    return image, draw, font
+
+def encode_png(image):
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+def render_activity_chart(title, labels, values, color):
+    """Vertical bar chart of one value per day, returned as PNG bytes."""
+    image, draw, font = chart_canvas(title)
+    left, top, right, bottom = CHART_MARGIN
+    width, height = CHART_SIZE[0] - left - right, CHART_SIZE[1] - top - bottom
+    peak = max(values) if values and max(values) > 0 else 1
+
+    for step in range(5):
+        y = top + height - height * step / 4
+        draw.line((left, y, left + width, y), fill=(70, 73, 80))
+        draw.text((5, y - 6), f"{round(peak * step / 4):,}", fill=(185, 187, 190), font=font)
+
+    slot = width / max(len(values), 1)
+    label_every = max(1, math.ceil(len(values) / 10))
+    for index, value in enumerate(values):
+        x = left + index * slot
+        bar_top = top + height - height * value / peak
+        draw.rectangle((x + slot * 0.1, bar_top, x + slot * 0.9, top + height), fill=color)
+        if index % label_every == 0:
+            draw.text((x, top + height + 8), labels[index], fill=(185, 187, 190), font=font)
+
+    return encode_png(image)
+
+def render_leaderboard_chart(title, names, values, color):
+    """Horizontal bar chart of the top entries of a leaderboard, as PNG bytes."""
+    image, draw, font = chart_canvas(title)
+    left, top, right, bottom = 160, CHART_MARGIN[1], 90, 20
+    width, height = CHART_SIZE[0] - left - right, CHART_SIZE[1] - top - bottom
+    peak = max(values) if values and max(values) > 0 else 1
+
+    slot = height / max(len(values), 10)
+    for index, (name, value) in enumerate(zip(names, values)):
+        y = top + index * slot
+        bar_right = left + width * value / peak
+        draw.rectangle((left, y + slot * 0.15, max(left + 1, bar_right), y + slot * 0.85), fill=color)
+        draw.text((10, y + slot / 2 - 6), f"#{index + 1} {name[:20]}", fill=(255, 255, 255), font=font)
+        draw.text((bar_right + 8, y + slot / 2 - 6), f"{value:,}", fill=(185, 187, 190), font=font)
+
+    return encode_png(image)
+
+CHART_RENDERERS = {
+    "activity": render_activity_chart,
+    "leaderboard": render_leaderboard_chart,
+}
+
+class ChartRenderer:
+    """Renders charts in a small thread pool and caches the PNGs by input hash."""
+
+    def __init__(self, max_workers=CHART_WORKERS, cache_size=CHART_CACHE_SIZE):
+        self.max_workers = max_workers
+        self.cache = LRUCache(cache_size)
+        self.pool = None
+
+    def executor(self):
+        if self.pool is None:
+            self.pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="chart")
+        return self.pool
+
+    async def render(self, kind, *args):
+        key = hashlib.sha256(json.dumps([kind, args], default=str).encode("utf-8")).hexdigest()
+        png = self.cache.get(key)
+        if png is not None:
+            return png
+
+        png = await asyncio.get_running_loop().run_in_executor(self.executor(), CHART_RENDERERS[kind], *args)
+        self.cache.put(key, png)
+        return png
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+
+chart_renderer = ChartRenderer()
+
+def embed_color_rgb():
+    color = BOT_CONFIG["default_embed_color"]
+    return ((color >> 16) & 0xFF, (color >> 8) & 0xFF, color & 0xFF)
+
+# --------- Outbound Message Dispatcher -----------
+
+class OutboundMessage:
+    __slots__ = ("priority", "seq", "content", "embeds", "delete_after", "coalesce", "allowed_mentions")
+
+    def __init__(self, priority, seq, content, embeds, delete_after, coalesce, allowed_mentions):
+        self.priority = priority
+        self.seq = seq
+        self.content = content
+        self.embeds = embeds
+        self.delete_after = delete_after
+        self.coalesce = coalesce
+        self.allowed_mentions = allowed_mentions
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+    def embed_size(self):
+        return sum(len(embed) for embed in self.embeds)
+
+class OutboundDispatcher:
+    """Queues bot announcements per channel and sends them in the background."""
+
+    def __init__(self, rate=OUTBOUND_CHANNEL_RATE, max_queue=OUTBOUND_MAX_QUEUE):
+        self.capacity, self.per = rate
+        self.max_queue = max_queue
+        self.queues = {}
+        self.workers = {}
+        self.buckets = {}
+        self.seq = 0
+        self.sent = 0
+        self.merged = 0
+        self.dropped = 0
+
+    def send(self, channel, content=None, *, embed=None, priority=PRIORITY_NORMAL,
+             delete_after=None, coalesce=None, allowed_mentions=None):
+        queue = self.queues.setdefault(channel.id, [])
+        if len(queue) >= self.max_queue:
+            self.dropped += 1
+            logger.warning(f"Outbound queue for channel {channel.id} is full, dropping message")
+            return
+
+        self.seq += 1
+        message = OutboundMessage(priority, self.seq, content, [embed] if embed else [],
+                                  delete_after, coalesce, allowed_mentions)
+        heapq.heappush(queue, message)
+
+        if channel.id not in self.workers:
+            self.workers[channel.id] = asyncio.create_task(self.drain(channel))
+
+    def pending(self):
+        return sum(len(queue) for queue in self.queues.values())
+
+    def take_batch(self, queue):
+        """Pop the next message and merge every queued message compatible with it."""
+        first = heapq.heappop(queue)
+        if not queue or (first.coalesce is None and (first.content or not first.embeds)):
+            return first
+
+        content, embeds, size = first.content, list(first.embeds), first.embed_size()
+        rest = []
+        for message in sorted(queue):
+            compatible = (message.delete_after == first.delete_after
+                          and message.allowed_mentions == first.allowed_mentions)
+            if compatible and first.coalesce is not None and message.coalesce == first.coalesce \
+                    and len(content) + len(message.content) < 2000 and not message.embeds:
+                content = f"{content}\n{message.content}"
+            elif compatible and first.coalesce is None and not message.content and message.coalesce is None \
+                    and len(embeds) + len(message.embeds) <= 10 and size + message.embed_size() <= 6000:
+                embeds.extend(message.embeds)
+                size += message.embed_size()
+            else:
+                rest.append(message)
+                continue
+            self.merged += 1
+
+        queue[:] = rest
+        heapq.heapify(queue)
+        first.content, first.embeds = content, embeds
+        return first
+
+    async def acquire(self, channel_id):
+        tokens, updated = self.buckets.get(channel_id, (self.capacity, time.monotonic()))
+        while True:
+            now = time.monotonic()
+            tokens = min(self.capacity, tokens + (now - updated) * self.capacity / self.per)
+            updated = now
+            if tokens >= 1:
+                self.buckets[channel_id] = (tokens - 1, updated)
+                return
+            await asyncio.sleep((1 - tokens) * self.per / self.capacity)
+
+    async def drain(self, channel):
+        queue = self.queues[channel.id]
+        try:
+            while queue:
+                await self.acquire(channel.id)
+                message = self.take_batch(queue)
+                await self.deliver(channel, message)
+        finally:
+            self.workers.pop(channel.id, None)
+            if not queue:
+                self.queues.pop(channel.id, None)
+
+    async def deliver(self, channel, message):
+        kwargs = {"delete_after": message.delete_after}
+        if message.allowed_mentions is not None:
+            kwargs["allowed_mentions"] = message.allowed_mentions
+        if message.embeds:
+            kwargs["embeds"] = message.embeds
+
+        for attempt in range(3):
+            try:
+                await channel.send(content=message.content, **kwargs)
+                self.sent += 1
+                return
+            except discord.RateLimited as e:
+                # The bucket was exhausted by something outside this queue
+                self.buckets[channel.id] = (0, time.monotonic())
+                await asyncio.sleep(e.retry_after)
+            except discord.HTTPException as e:
+                if e.status != 429:
+                    logger.error(f"Failed to send queued message to channel {channel.id}: {e}")
+                    return
+                self.buckets[channel.id] = (0, time.monotonic())
+                await asyncio.sleep(self.per)
+        logger.error(f"Giving up on queued message to channel {channel.id} after repeated rate limits")
+
+outbound = OutboundDispatcher()
 
 # --------- Image Upload Function -----------
 
@@ -229,7 +2121,7 @@ class HelpNavigationView(discord.ui.View):
                 "description": "Commands available to all server members",
                 "fields": [
                     {"name": "💰 Economy Commands", "value": "`/balance` - Check your currency balance\n`/shop list [shop_name]` - Browse shops and items\n`/shop buy` - Purchase items\n`/inventory` - View your items\n`/gift` - Give items to others\n`/trade` - Trade items with others", "inline": False},
-                    {"name": "📊 Level & Stats", "value": "`/level [user]` - View level and XP\n`/level leaderboard` - Server rankings\n`/messages` - View message statistics", "inline": False},
+                    {"name": "📊 Level & Stats", "value": "`/level [user]` - View level and XP\n`/leaderboard [board]` - XP, balance and message rankings\n`/messages` - View message statistics", "inline": False},
                     {"name": "👤 Profile System", "value": "`/profile create` - Create your profile\n`/profile view [user]` - View profiles\n`/profile edit` - Edit your profile\n`/profile list_presets` - Available presets", "inline": False}
                 ]
             },
@@ -239,7 +2131,7 @@ class HelpNavigationView(discord.ui.View):
                 "fields": [
                     {"name": "📝 Utility Commands", "value": "`/suggest` - Submit suggestions to staff\n`/report` - Report issues or users\n`/afk [reason]` - Set yourself as AFK\n`/remindme` - Set personal reminders", "inline": False},
                     {"name": "🎰 Premium Slots", "value": "`/viewslots` - Check your premium auction slots\n`/auction list` - View active auctions", "inline": False},
-                    {"name": "🎉 Giveaways", "value": "`/giveaway_claim` - Mark prizes as claimed (if winner)\n`/giveaway_unclaimed` - View unclaimed prizes", "inline": False}
+                    {"name": "🎉 Giveaways", "value": "`/giveaway_claim` - Mark prizes as claimed (if winner)\n`/giveaway_unclaimed` - View unclaimed prizes\n`/giveaway_verify` - Re-check a giveaway draw", "inline": False}
                 ]
             },
             {
@@ -257,7 +2149,8 @@ class HelpNavigationView(discord.ui.View):
                 "fields": [
                     {"name": "🎉 Giveaway System", "value": "`/giveaway` - Create interactive giveaways\n• Role restrictions and requirements\n• Extra entry systems\n• Automatic winner selection", "inline": False},
                     {"name": "🏺 Auction System", "value": "`/auction` - Create auction posts\n• Regular and premium auctions\n• Image upload support\n• Automatic thread creation", "inline": False},
-                    {"name": "🤖 Automation Tools", "value": "`/autoresponder` - Set up auto-responses\n`/sticky` - Create sticky messages\n`/verification` - Set up verification systems", "inline": False}
+                    {"name": "🤖 Automation Tools", "value": "`/autoresponder` - Set up auto-responses\n`/sticky` - Create sticky messages\n`/verification` - Set up verification systems", "inline": False},
+                    {"name": "📈 Analytics", "value": "`/analytics [days]` - Message volume, active members, retention and top channels for any date range\n`/chart` - Activity and leaderboard charts", "inline": False}
                 ]
             },
             {
@@ -282,7 +2175,7 @@ class HelpNavigationView(discord.ui.View):
                 "title": "🔧 Admin Commands - Management",
                 "description": "Advanced administrative tools",
                 "fields": [
-                    {"name": "🧹 Data Management", "value": "`/cleanup_data` - Remove old/invalid data\n`/export_data` - Backup data files\n• Automated cleanup systems\n• Data integrity maintenance", "inline": False},
+                    {"name": "🧹 Data Management", "value": "`/cleanup_data` - Remove old/invalid data\n`/export_data` - Backup data files\n`/backup` - List, verify and restore backups\n• Automated cleanup systems\n• Data integrity maintenance", "inline": False},
                     {"name": "🔍 Debug Tools", "value": "`/debug_info` - Bot performance metrics\n`/debug_user` - User data inspection\n`/debug_performance` - System statistics", "inline": False},
                     {"name": "🏪 Role Menu System", "value": "`/role_menu` - Create self-role systems\n• Interactive role selection\n• Category organization\n• Automatic role management", "inline": False}
                 ]
@@ -885,14 +2778,8 @@ class ShopBuyView(discord.ui.View):
             return
 
         # Process purchase
-        user_balances[user_id] -= price
-        
-        if item_name not in user_inventories[user_id]:
-            user_inventories[user_id][item_name] = 0
-        user_inventories[user_id][item_name] += 1
-
-        save_json("balances.json", user_balances)
-        save_json("inventories.json", user_inventories)
+        adjust_balance(user_id, -price, "shop_buy", shop=self.current_shop, item=item_name)
+        adjust_inventory(user_id, item_name, 1, "shop_buy", shop=self.current_shop)
 
         embed = discord.Embed(
             title="✅ Purchase Successful!",
@@ -1656,12 +3543,13 @@ class GiveawaySetupView(discord.ui.View):
 
         embed.set_footer(text="Click the button below to join!")
 
-        view = GiveawayJoinView(giveaway_id)
-        giveaway_message = await interaction.followup.send(embed=embed, view=view)
+        giveaway_message = await interaction.followup.send(embed=embed, view=giveaway_buttons(giveaway_id))
 
         self.giveaway_data["message_id"] = giveaway_message.id
         giveaways_data[giveaway_id] = self.giveaway_data
         save_json("giveaways.json", giveaways_data)
+        giveaway_rules[giveaway_id] = GiveawayRules(self.giveaway_data)
+        giveaway_scheduler.schedule(giveaway_id, end_time)
 
         success_embed = discord.Embed(
             title="✅ Giveaway Created!",
@@ -1757,6 +3645,22 @@ class GiveawayRequirementsView(discord.ui.View):
         modal = GiveawayLevelModal(self.parent_view)
         await interaction.response.send_modal(modal)
 
+    @discord.ui.button(label="👥 Preview Eligible", style=discord.ButtonStyle.secondary)
+    async def preview_eligible(self, interaction: discord.Interaction, button: discord.ui.Button):
+        counts = prequalify_members(GiveawayRules(self.parent_view.giveaway_data), interaction.guild.members)
+
+        embed = discord.Embed(
+            title="Eligible Members",
+            description=f"**{counts['eligible']:,}** of {counts['members']:,} members can join with the current requirements.",
+            color=BOT_CONFIG["default_embed_color"]
+        )
+        embed.add_field(name="Missing Roles", value=f"{counts['roles']:,}", inline=True)
+        embed.add_field(name="Level Too Low", value=f"{counts['level']:,}", inline=True)
+        embed.add_field(name="Extra Entries", value=f"{counts['extra']:,}", inline=True)
+        embed.add_field(name="Total Entries", value=f"{counts['entries']:,} if everyone joins", inline=False)
+
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
     @discord.ui.button(label="Back to Main", style=discord.ButtonStyle.primary)
     async def back_to_main(self, interaction: discord.Interaction, button: discord.ui.Button):
         await self.parent_view.update_display(interaction)
@@ -1916,13 +3820,99 @@ class GiveawayLevelModal(discord.ui.Modal):
         except ValueError:
             await interaction.response.send_message("Invalid level. Please enter a number.", ephemeral=True)
 
-class GiveawayJoinView(discord.ui.View):
+class GiveawayRules:
+    """Join requirements of one giveaway, compiled to role-ID sets."""
+
+    __slots__ = ("required", "bypass", "required_level", "entry_priority", "watched")
+
+    def __init__(self, giveaway):
+        self.required = frozenset(giveaway.get("required_roles") or ())
+        self.bypass = frozenset(giveaway.get("bypass_roles") or ())
+        self.required_level = giveaway.get("required_level") or 0
+        # role id -> (position in the configured list, entries)
+        self.entry_priority = {}
+        for priority, role_config in enumerate(giveaway.get("extra_entry_roles") or ()):
+            self.entry_priority.setdefault(role_config["role_id"], (priority, role_config["entries"]))
+        self.watched = self.required | self.bypass | frozenset(self.entry_priority)
+
+    def member_roles(self, member):
+        return self.watched.intersection(role.id for role in member.roles)
+
+    def check(self, roles, level_of):
+        """Return ``(reason, entries)`` for a member's watched ``roles``."""
+        if self.required and not roles & self.required:
+            return "roles", None
+        if self.required_level > 0 and not roles & self.bypass and level_of() < self.required_level:
+            return "level", None
+        matched = [self.entry_priority[role_id] for role_id in roles if role_id in self.entry_priority]
+        return None, min(matched)[1] if matched else None
+
+giveaway_rules = {}
+
+def get_giveaway_rules(giveaway_id):
+    rules = giveaway_rules.get(giveaway_id)
+    if rules is None:
+        rules = giveaway_rules[giveaway_id] = GiveawayRules(giveaways_data[giveaway_id])
+    return rules
+
+def rebuild_giveaway_rules():
+    giveaway_rules.clear()
+    for giveaway_id, giveaway in giveaways_data.items():
+        if giveaway.get("status") == "active":
+            giveaway_rules[giveaway_id] = GiveawayRules(giveaway)
+
+rebuild_giveaway_rules()
+
+def member_level(user_id: str):
+    ensure_user_in_stats(user_id)
+    stats_accumulator.merge_user(user_id)
+    return calculate_level(member_stats.get(user_id, {}).get("xp", 0))
+
+def prequalify_members(rules, members):
+    """Count how many members could join under ``rules`` in one pass."""
+    xp_by_user = {}
+    if rules.required_level > 0:
+        # Stored XP plus anything still buffered, without merging the buffer
+        xp_by_user = dict(member_stat_values("xp"))
+        for user_id, entry in stats_accumulator.pending.items():
+            xp_by_user[user_id] = entry[2] + entry[1]
+
+    counts = {"members": 0, "eligible": 0, "roles": 0, "level": 0, "extra": 0, "entries": 0}
+    for member in members:
+        if member.bot:
+            continue
+        counts["members"] += 1
+        reason, entries = rules.check(
+            rules.member_roles(member),
+            lambda: calculate_level(xp_by_user.get(str(member.id), 0))
+        )
+        if reason:
+            counts[reason] += 1
+            continue
+        counts["eligible"] += 1
+        if entries:
+            counts["extra"] += 1
+        counts["entries"] += entries or 1
+    return counts
+
+# Giveaway buttons are dynamic items: the giveaway ID lives in the custom_id and
+# a single registered handler per button type routes clicks for every giveaway,
+# including messages posted before a restart, without a stored view per giveaway.
+
+class GiveawayJoinButton(discord.ui.DynamicItem[discord.ui.Button], template=r"giveaway:join:(?P<giveaway_id>[\w-]+)"):
     def __init__(self, giveaway_id: str):
-        super().__init__(timeout=None)
+        super().__init__(discord.ui.Button(
+            label="🎉 Join Giveaway",
+            style=discord.ButtonStyle.primary,
+            custom_id=f"giveaway:join:{giveaway_id}"
+        ))
         self.giveaway_id = giveaway_id
 
-    @discord.ui.button(label="🎉 Join Giveaway", style=discord.ButtonStyle.primary)
-    async def join_giveaway(self, interaction: discord.Interaction, button: discord.ui.Button):
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(match["giveaway_id"])
+
+    async def callback(self, interaction: discord.Interaction):
         giveaway = giveaways_data.get(self.giveaway_id)
         if not giveaway or giveaway["status"] != "active":
             await interaction.response.send_message("This giveaway is no longer active.", ephemeral=True)
@@ -1930,49 +3920,42 @@ class GiveawayJoinView(discord.ui.View):
 
         user_id = str(interaction.user.id)
 
-        # Check role restrictions
-        if giveaway.get("required_roles"):
-            user_role_ids = [role.id for role in interaction.user.roles]
-            if not any(role_id in user_role_ids for role_id in giveaway["required_roles"]):
-                await interaction.response.send_message("You don't have the required roles to join this giveaway.", ephemeral=True)
-                return
-
-        # Check level requirement
-        if giveaway.get("required_level", 0) > 0:
-            ensure_user_in_stats(user_id)
-            user_level = calculate_level(member_stats.get(user_id, {}).get("xp", 0))
-            if user_level < giveaway["required_level"]:
-                # Check bypass roles
-                if giveaway.get("bypass_roles"):
-                    user_role_ids = [role.id for role in interaction.user.roles]
-                    has_bypass = any(role_id in user_role_ids for role_id in giveaway["bypass_roles"])
-                    if not has_bypass:
-                        await interaction.response.send_message(f"You need to be Level {giveaway['required_level']} or higher to join this giveaway.", ephemeral=True)
-                        return
-                else:
-                    await interaction.response.send_message(f"You need to be Level {giveaway['required_level']} or higher to join this giveaway.", ephemeral=True)
-                    return
+        # Check role and level requirements against the compiled rules
+        rules = get_giveaway_rules(self.giveaway_id)
+        reason, extra_entries = rules.check(rules.member_roles(interaction.user), lambda: member_level(user_id))
+        if reason == "roles":
+            await interaction.response.send_message("You don't have the required roles to join this giveaway.", ephemeral=True)
+            return
+        if reason == "level":
+            await interaction.response.send_message(f"You need to be Level {rules.required_level} or higher to join this giveaway.", ephemeral=True)
+            return
 
-        # Add user to participants
-        if user_id not in giveaway["participants"]:
-            giveaway["participants"][user_id] = {"entries": 1}
+        entries = extra_entries or giveaway["participants"].get(user_id, {}).get("entries", 1)
 
-        # Check for extra entries
-        if giveaway.get("extra_entry_roles"):
-            user_role_ids = [role.id for role in interaction.user.roles]
-            for role_config in giveaway["extra_entry_roles"]:
-                if role_config["role_id"] in user_role_ids:
-                    giveaway["participants"][user_id]["entries"] = role_config["entries"]
-                    break
+        # Add user to participants; the log makes the join durable and the
+        # store is rewritten in batches by the flush timer
+        if giveaway["participants"].get(user_id, {}).get("entries") != entries:
+            participant_log.append(self.giveaway_id, user_id, entries)
+            giveaway["participants"][user_id] = {"entries": entries}
+            persistence.touch("giveaways.json", self.giveaway_id)
 
-        save_json("giveaways.json", giveaways_data)
-
-        entries = giveaway["participants"][user_id]["entries"]
         entry_text = "entry" if entries == 1 else "entries"
         await interaction.response.send_message(f"You've joined the giveaway with {entries} {entry_text}!", ephemeral=True)
 
-    @discord.ui.button(label="📊 View Info", style=discord.ButtonStyle.secondary)
-    async def view_info(self, interaction: discord.Interaction, button: discord.ui.Button):
+class GiveawayInfoButton(discord.ui.DynamicItem[discord.ui.Button], template=r"giveaway:info:(?P<giveaway_id>[\w-]+)"):
+    def __init__(self, giveaway_id: str):
+        super().__init__(discord.ui.Button(
+            label="📊 View Info",
+            style=discord.ButtonStyle.secondary,
+            custom_id=f"giveaway:info:{giveaway_id}"
+        ))
+        self.giveaway_id = giveaway_id
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(match["giveaway_id"])
+
+    async def callback(self, interaction: discord.Interaction):
         giveaway = giveaways_data.get(self.giveaway_id)
         if not giveaway:
             await interaction.response.send_message("Giveaway not found.", ephemeral=True)
@@ -1998,6 +3981,16 @@ class GiveawayJoinView(discord.ui.View):
 
         await interaction.response.send_message(embed=embed, ephemeral=True)
 
+def giveaway_buttons(giveaway_id: str) -> discord.ui.View:
+    """Build the components for a giveaway message."""
+    view = discord.ui.View(timeout=None)
+    view.add_item(GiveawayJoinButton(giveaway_id))
+    view.add_item(GiveawayInfoButton(giveaway_id))
+    view.stop()
+    return view
+
+bot.add_dynamic_items(GiveawayJoinButton, GiveawayInfoButton)
+
 @tree.command(name="giveaway", description="Create giveaways with interactive setup", guild=discord.Object(id=GUILD_ID))
 @guild_only()
 async def giveaway(interaction: discord.Interaction):
@@ -2254,6 +4247,84 @@ class ProfileEditModal(discord.ui.Modal):
 
 # --------- Verification System -----------
 
+# A verification entry is either a plain word or a /regex/; entries are comma
+# separated and a regex may itself contain commas.
+VERIFICATION_ENTRY_RE = re.compile(r"\s*(/(?:\\.|[^/\\])+/|[^,]+)")
+
+def parse_verification_words(raw: str):
+    """Split the raw verification setting into its word and /regex/ entries."""
+    entries, seen = [], set()
+    for entry in VERIFICATION_ENTRY_RE.findall(raw or ""):
+        entry = entry.strip()
+        if entry and entry.lower() not in seen:
+            seen.add(entry.lower())
+            entries.append(entry)
+    return entries
+
+def verification_pattern(entry: str):
+    if len(entry) > 2 and entry.startswith("/") and entry.endswith("/"):
+        return entry[1:-1]
+    return re.escape(entry.lower())
+
+class VerificationMatcher:
+    """Compiled form of verification.json, rebuilt only when settings change."""
+
+    __slots__ = ("regex", "standalone", "role_id", "channel_id", "delete_messages")
+
+    def __init__(self, entries, role_id, channel_id=None, delete_messages=False):
+        combined, self.standalone = [], []
+        for entry in entries:
+            source = verification_pattern(entry)
+            pattern = re.compile(source, re.IGNORECASE)
+            # As with autoresponders, joining would renumber backreferences and
+            # inline flags are only valid at the start of a pattern
+            if pattern.groups == 0 and "(?" not in source:
+                combined.append(f"(?:{source})")
+            else:
+                self.standalone.append(pattern)
+        self.regex = re.compile("|".join(combined), re.IGNORECASE) if combined else None
+        self.role_id = role_id
+        self.channel_id = channel_id
+        self.delete_messages = delete_messages
+
+    def applies_to(self, channel_id: int) -> bool:
+        return self.channel_id is None or self.channel_id == channel_id
+
+    def matches(self, content: str) -> bool:
+        if self.regex is not None and self.regex.search(content) is not None:
+            return True
+        return any(pattern.search(content) for pattern in self.standalone)
+
+verification_matcher = None
+
+def rebuild_verification_matcher():
+    """Recompile the verification rule; None when verification can't trigger."""
+    global verification_matcher
+    if "words" in verification_data:
+        entries = verification_data["words"]
+    else:
+        # Settings saved before multiple words were supported hold a single
+        # word, which may itself contain commas ("yes, i agree")
+        legacy_word = verification_data.get("word", "").strip()
+        entries = [legacy_word] if legacy_word else []
+    role_id = verification_data.get("role_id")
+    if not verification_data.get("enabled", False) or not entries or not role_id:
+        verification_matcher = None
+        return None
+
+    try:
+        verification_matcher = VerificationMatcher(
+            entries, role_id,
+            channel_id=verification_data.get("channel_id"),
+            delete_messages=verification_data.get("delete_messages", False)
+        )
+    except re.error as e:
+        logger.error(f"Invalid verification pattern, verification disabled: {e}")
+        verification_matcher = None
+    return verification_matcher
+
+rebuild_verification_matcher()
+
 class VerificationSetupView(discord.ui.View):
     def __init__(self):
         super().__init__(timeout=300)
@@ -2273,6 +4344,7 @@ class VerificationSetupView(discord.ui.View):
         current_setting = verification_data.get("delete_messages", False)
         verification_data["delete_messages"] = not current_setting
         save_json("verification.json", verification_data)
+        rebuild_verification_matcher()
         
         status = "enabled" if verification_data["delete_messages"] else "disabled"
         await interaction.response.send_message(f"✅ Message deletion is now **{status}**", ephemeral=True)
@@ -2289,12 +4361,14 @@ class VerificationSetupView(discord.ui.View):
 
         verification_data["enabled"] = True
         save_json("verification.json", verification_data)
+        rebuild_verification_matcher()
         await interaction.response.send_message("✅ Verification system enabled!", ephemeral=True)
 
     @discord.ui.button(label="❌ Disable Verification", style=discord.ButtonStyle.red)
     async def disable_verification(self, interaction: discord.Interaction, button: discord.ui.Button):
         verification_data["enabled"] = False
         save_json("verification.json", verification_data)
+        rebuild_verification_matcher()
         await interaction.response.send_message("❌ Verification system disabled!", ephemeral=True)
 
     async def update_display(self, interaction: discord.Interaction):
@@ -2307,9 +4381,9 @@ class VerificationSetupView(discord.ui.View):
         status = "🟢 Enabled" if verification_data.get("enabled", False) else "🔴 Disabled"
         embed.add_field(name="Status", value=status, inline=True)
 
-        # Word
+        # Words
         word = verification_data.get("word", "Not set")
-        embed.add_field(name="Verification Word", value=f"`{word}`" if word != "Not set" else word, inline=True)
+        embed.add_field(name="Verification Words", value=f"`{word}`" if word != "Not set" else word, inline=True)
 
         # Role
         role_id = verification_data.get("role_id")
@@ -2337,20 +4411,34 @@ class VerificationSetupView(discord.ui.View):
 
 class VerificationWordModal(discord.ui.Modal):
     def __init__(self):
-        super().__init__(title="Set Verification Word")
+        super().__init__(title="Set Verification Words")
 
         self.word = discord.ui.TextInput(
-            label="Verification Word",
-            placeholder="Enter the word users must say to get verified",
+            label="Verification Words",
+            placeholder="Comma separated words, or /regex/ patterns",
+            default=verification_data.get("word"),
             required=True,
-            max_length=50
+            max_length=200
         )
         self.add_item(self.word)
 
     async def on_submit(self, interaction: discord.Interaction):
-        verification_data["word"] = self.word.value.lower().strip()
+        entries = parse_verification_words(self.word.value)
+        if not entries:
+            await interaction.response.send_message("Please enter at least one word or pattern.", ephemeral=True)
+            return
+
+        try:
+            VerificationMatcher(entries, None)
+        except re.error as e:
+            await interaction.response.send_message(f"Invalid pattern: {e}", ephemeral=True)
+            return
+
+        verification_data["word"] = ", ".join(entries)
+        verification_data["words"] = entries
         save_json("verification.json", verification_data)
-        await interaction.response.send_message(f"✅ Verification word set to: `{self.word.value}`", ephemeral=True)
+        rebuild_verification_matcher()
+        await interaction.response.send_message(f"✅ Verification words set to: `{verification_data['word']}`", ephemeral=True)
 
 class VerificationRoleModal(discord.ui.Modal):
     def __init__(self):
@@ -2375,6 +4463,7 @@ class VerificationRoleModal(discord.ui.Modal):
 
             verification_data["role_id"] = role_id
             save_json("verification.json", verification_data)
+            rebuild_verification_matcher()
             await interaction.response.send_message(f"✅ Verification role set to: {role.mention}", ephemeral=True)
 
         except ValueError:
@@ -2399,7 +4488,7 @@ async def verification_setup(interaction: discord.Interaction):
     embed.add_field(name="Current Status", value=status, inline=True)
 
     word = verification_data.get("word", "Not set")
-    embed.add_field(name="Verification Word", value=f"`{word}`" if word != "Not set" else word, inline=True)
+    embed.add_field(name="Verification Words", value=f"`{word}`" if word != "Not set" else word, inline=True)
 
     delete_enabled = "🟢 Yes" if verification_data.get("delete_messages", False) else "🔴 No"
     embed.add_field(name="Delete Messages", value=delete_enabled, inline=True)
@@ -2417,12 +4506,379 @@ async def verification_channel(interaction: discord.Interaction, channel: discor
     if channel:
         verification_data["channel_id"] = channel.id
         save_json("verification.json", verification_data)
+        rebuild_verification_matcher()
         await interaction.response.send_message(f"✅ Verification restricted to {channel.mention}", ephemeral=True)
     else:
         verification_data.pop("channel_id", None)
         save_json("verification.json", verification_data)
+        rebuild_verification_matcher()
         await interaction.response.send_message("✅ Verification can now work in any channel", ephemeral=True)
 
+# --------- Autoresponder System -----------
+
+AUTORESPONDER_MATCH_TYPES = ("exact", "prefix", "contains", "regex")
+AUTORESPONDER_MENTIONS = discord.AllowedMentions(users=True, roles=False, everyone=False)
+
+class AhoCorasick:
+    """Multi-pattern substring automaton yielding (start, pattern_index) hits."""
+
+    def __init__(self, patterns):
+        self.lengths = [len(p) for p in patterns]
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+
+        for index, pattern in enumerate(patterns):
+            state = 0
+            for char in pattern:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][char] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                state = next_state
+            self.output[state].append(index)
+
+        # Breadth-first fail links; each state inherits its fail state's output
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+
+    def search(self, text: str):
+        goto, fail, output, lengths = self.goto, self.fail, self.output, self.lengths
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for index in output[state]:
+                yield position - lengths[index] + 1, index
+
+def compile_autoresponder_regex(trigger: str):
+    return re.compile(trigger, re.IGNORECASE)
+
+class AutoresponderEngine:
+    """Compiled form of autoresponders.json, rebuilt only when triggers change."""
+
+    def __init__(self, entries):
+        self.entries = entries
+        self.exact = {}
+        literal_patterns, self.literal_ids = [], []
+        regex_parts = []
+        # (trigger id, compiled pattern, covered by the combined prefilter)
+        self.regexes = []
+
+        for trigger_id, entry in entries.items():
+            match_type = entry.get("match", "contains")
+            trigger = entry.get("trigger", "")
+            if not trigger:
+                continue
+            if match_type == "regex":
+                try:
+                    pattern = compile_autoresponder_regex(trigger)
+                except re.error as e:
+                    logger.error(f"Invalid autoresponder pattern {trigger_id}, skipping it: {e}")
+                    continue
+                # Groups renumber backreferences and clash on names, and inline
+                # flags are only valid at the start, so those stay standalone
+                combinable = pattern.groups == 0 and "(?" not in trigger
+                if combinable:
+                    regex_parts.append(f"(?:{trigger})")
+                self.regexes.append((trigger_id, pattern, combinable))
+            elif match_type == "exact":
+                self.exact.setdefault(trigger.lower().strip(), []).append(trigger_id)
+            else:
+                literal_patterns.append(trigger.lower())
+                self.literal_ids.append(trigger_id)
+
+        self.automaton = AhoCorasick(literal_patterns) if literal_patterns else None
+        self.regex_filter = None
+        if regex_parts:
+            try:
+                self.regex_filter = re.compile("|".join(regex_parts), re.IGNORECASE)
+            except re.error as e:
+                logger.warning(f"Autoresponder prefilter failed to compile, searching patterns individually: {e}")
+                self.regexes = [(trigger_id, pattern, False) for trigger_id, pattern, _ in self.regexes]
+        self.all_prefiltered = all(combinable for _, _, combinable in self.regexes)
+
+    def candidates(self, content: str):
+        """Trigger ids whose pattern matches, in exact/prefix/contains/regex order."""
+        lowered = content.lower()
+        found = list(self.exact.get(lowered.strip(), ()))
+
+        if self.automaton is not None:
+            hits = {}
+            for start, index in self.automaton.search(lowered):
+                trigger_id = self.literal_ids[index]
+                if self.entries[trigger_id].get("match") == "prefix" and start != 0:
+                    continue
+                hits.setdefault(trigger_id, start)
+            found.extend(sorted(hits, key=lambda t: self.entries[t].get("match") != "prefix"))
+
+        if self.regexes:
+            prefiltered = self.regex_filter is not None and self.regex_filter.search(content) is not None
+            if prefiltered or not self.all_prefiltered:
+                found.extend(
+                    trigger_id for trigger_id, pattern, combinable in self.regexes
+                    if (prefiltered or not combinable) and pattern.search(content)
+                )
+        return found
+
+    def match(self, message: discord.Message):
+        """First trigger that matches the message and is in scope for it."""
+        role_ids = None
+        for trigger_id in self.candidates(message.content):
+            entry = self.entries[trigger_id]
+            channels = entry.get("channels")
+            if channels and message.channel.id not in channels:
+                continue
+            roles = entry.get("roles")
+            if roles:
+                if role_ids is None:
+                    role_ids = {role.id for role in getattr(message.author, "roles", ())}
+                if role_ids.isdisjoint(roles):
+                    continue
+            return trigger_id
+        return None
+
+autoresponder_engine = None
+# Last time each trigger fired (monotonic seconds); only needs to live in memory
+autoresponder_last_used = {}
+
+def rebuild_autoresponder_engine():
+    global autoresponder_engine
+    autoresponder_engine = AutoresponderEngine(dict(autoresponders)) if autoresponders else None
+    return autoresponder_engine
+
+rebuild_autoresponder_engine()
+
+async def run_autoresponders(message: discord.Message):
+    engine = autoresponder_engine
+    if engine is None:
+        return
+
+    trigger_id = engine.match(message)
+    if trigger_id is None:
+        return
+
+    entry = engine.entries[trigger_id]
+    now = time.monotonic()
+    cooldown = entry.get("cooldown", 0)
+    if cooldown and now - autoresponder_last_used.get(trigger_id, 0) < cooldown:
+        return
+    autoresponder_last_used[trigger_id] = now
+
+    response = entry.get("response", "").replace("{user}", message.author.mention).replace("{server}", message.guild.name)
+    outbound.send(message.channel, response, allowed_mentions=AUTORESPONDER_MENTIONS)
+
+@tree.command(name="autoresponder", description="Set up automatic responses to trigger phrases", guild=discord.Object(id=GUILD_ID))
+@guild_only()
+@app_commands.describe(
+    action="What to do",
+    trigger="Trigger text, or a regular expression for regex triggers",
+    match="How the trigger is matched against messages",
+    response="Response to send ({user} and {server} are replaced)",
+    channel="Only respond in this channel",
+    role="Only respond to members with this role",
+    cooldown="Seconds before this trigger can fire again",
+    trigger_id="ID of the autoresponder to remove"
+)
+@app_commands.choices(
+    action=[
+        app_commands.Choice(name="Add", value="add"),
+        app_commands.Choice(name="Remove", value="remove"),
+        app_commands.Choice(name="List", value="list"),
+    ],
+    match=[app_commands.Choice(name=match_type.title(), value=match_type) for match_type in AUTORESPONDER_MATCH_TYPES]
+)
+async def autoresponder(
+    interaction: discord.Interaction,
+    action: app_commands.Choice[str],
+    trigger: str = None,
+    match: app_commands.Choice[str] = None,
+    response: str = None,
+    channel: discord.TextChannel = None,
+    role: discord.Role = None,
+    cooldown: app_commands.Range[int, 0, 86400] = 0,
+    trigger_id: str = None
+):
+    if not has_staff_role(interaction):
+        await interaction.response.send_message("You don't have permission to manage autoresponders.", ephemeral=True)
+        return
+
+    if action.value == "list":
+        embed = discord.Embed(title="Autoresponders", color=BOT_CONFIG["default_embed_color"])
+        if not autoresponders:
+            embed.description = "No autoresponders set up."
+        else:
+            lines = []
+            for ar_id, entry in list(autoresponders.items())[:25]:
+                scope = []
+                scope.extend(f"<#{c}>" for c in entry.get("channels", []))
+                scope.extend(f"<@&{r}>" for r in entry.get("roles", []))
+                line = f"`{ar_id}` • {entry['match']} `{entry['trigger']}`"
+                if scope:
+                    line += f" • {' '.join(scope)}"
+                if entry.get("cooldown"):
+                    line += f" • {entry['cooldown']}s cooldown"
+                lines.append(line)
+            embed.description = "\n".join(lines)
+            embed.set_footer(text=f"{len(autoresponders)} autoresponders")
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    elif action.value == "remove":
+        if not trigger_id or trigger_id not in autoresponders:
+            await interaction.response.send_message("Autoresponder not found. Use the list action to see IDs.", ephemeral=True)
+            return
+        del autoresponders[trigger_id]
+        autoresponder_last_used.pop(trigger_id, None)
+        save_json("autoresponders.json", autoresponders)
+        rebuild_autoresponder_engine()
+        await interaction.response.send_message(f"✅ Autoresponder `{trigger_id}` removed.", ephemeral=True)
+
+    elif action.value == "add":
+        if not trigger or not response:
+            await interaction.response.send_message("Please provide both a trigger and a response.", ephemeral=True)
+            return
+
+        match_type = match.value if match else "contains"
+        if match_type == "regex":
+            try:
+                compile_autoresponder_regex(trigger)
+            except re.error as e:
+                await interaction.response.send_message(f"Invalid regular expression: {e}", ephemeral=True)
+                return
+
+        new_id = str(uuid.uuid4())[:8]
+        autoresponders[new_id] = {
+            "trigger": trigger,
+            "match": match_type,
+            "response": response,
+            "channels": [channel.id] if channel else [],
+            "roles": [role.id] if role else [],
+            "cooldown": cooldown,
+            "created_by": interaction.user.id
+        }
+        save_json("autoresponders.json", autoresponders)
+        rebuild_autoresponder_engine()
+        await interaction.response.send_message(f"✅ Autoresponder `{new_id}` added ({match_type} match on `{trigger}`).", ephemeral=True)
+
+# --------- Sticky Message System -----------
+
+# Pending re-post per channel; while one is waiting, new messages are absorbed
+sticky_tasks = {}
+
+def schedule_sticky_repost(channel):
+    """Queue a re-post of the channel's sticky at the end of the debounce window."""
+    task = sticky_tasks.get(channel.id)
+    if task is not None and not task.done():
+        return
+    sticky_tasks[channel.id] = asyncio.create_task(repost_sticky(channel, STICKY_DEBOUNCE_SECONDS))
+
+async def repost_sticky(channel, delay=0):
+    if delay:
+        await asyncio.sleep(delay)
+
+    channel_key = str(channel.id)
+    sticky = sticky_messages.get(channel_key)
+    if not sticky:
+        return
+
+    old_message_id = sticky.get("message_id")
+    if old_message_id:
+        try:
+            await channel.get_partial_message(old_message_id).delete()
+        except discord.NotFound:
+            pass
+        except discord.HTTPException as e:
+            logger.error(f"Failed to delete sticky message in channel {channel.id}: {e}")
+
+    embed = discord.Embed(description=sticky["content"], color=BOT_CONFIG["default_embed_color"])
+    embed.set_footer(text="📌 Sticky message")
+    try:
+        new_message = await channel.send(embed=embed)
+    except discord.HTTPException as e:
+        logger.error(f"Failed to post sticky message in channel {channel.id}: {e}")
+        return
+
+    # The sticky may have been removed while we were sending
+    if channel_key in sticky_messages:
+        sticky_messages[channel_key]["message_id"] = new_message.id
+        persistence.touch("sticky_messages.json", channel_key)
+    else:
+        await new_message.delete()
+
+@tree.command(name="sticky", description="Keep a message pinned to the bottom of a channel", guild=discord.Object(id=GUILD_ID))
+@guild_only()
+@app_commands.describe(action="What to do", content="Sticky message text", channel="Channel (defaults to this one)")
+@app_commands.choices(action=[
+    app_commands.Choice(name="Set", value="set"),
+    app_commands.Choice(name="Remove", value="remove"),
+    app_commands.Choice(name="List", value="list"),
+])
+async def sticky(interaction: discord.Interaction, action: app_commands.Choice[str], content: str = None, channel: discord.TextChannel = None):
+    if not has_staff_role(interaction):
+        await interaction.response.send_message("You don't have permission to manage sticky messages.", ephemeral=True)
+        return
+
+    channel = channel or interaction.channel
+    channel_key = str(channel.id)
+
+    if action.value == "list":
+        embed = discord.Embed(title="Sticky Messages", color=BOT_CONFIG["default_embed_color"])
+        if sticky_messages:
+            embed.description = "\n".join(
+                f"<#{channel_id}>: {data['content'][:80]}" for channel_id, data in sticky_messages.items()
+            )
+        else:
+            embed.description = "No sticky messages set."
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    elif action.value == "remove":
+        sticky_data = sticky_messages.pop(channel_key, None)
+        if sticky_data is None:
+            await interaction.response.send_message(f"There is no sticky message in {channel.mention}.", ephemeral=True)
+            return
+
+        task = sticky_tasks.pop(channel.id, None)
+        if task is not None:
+            task.cancel()
+        save_json("sticky_messages.json", sticky_messages)
+
+        if sticky_data.get("message_id"):
+            try:
+                await channel.get_partial_message(sticky_data["message_id"]).delete()
+            except discord.HTTPException:
+                pass
+        await interaction.response.send_message(f"✅ Sticky message removed from {channel.mention}.", ephemeral=True)
+
+    elif action.value == "set":
+        if not content:
+            await interaction.response.send_message("Please provide the sticky message content.", ephemeral=True)
+            return
+
+        previous = sticky_messages.get(channel_key, {})
+        sticky_messages[channel_key] = {
+            "content": content,
+            "message_id": previous.get("message_id"),
+            "created_by": interaction.user.id
+        }
+        save_json("sticky_messages.json", sticky_messages)
+        await interaction.response.send_message(f"✅ Sticky message set in {channel.mention}.", ephemeral=True)
+
+        task = sticky_tasks.pop(channel.id, None)
+        if task is not None:
+            task.cancel()
+        await repost_sticky(channel)
+
 # --------- Additional Commands and Features -----------
 
 # --------- User Commands Implementation -----------
@@ -2471,15 +4927,17 @@ async def inventory(interaction: discord.Interaction):
 async def messages(interaction: discord.Interaction):
     uid = str(interaction.user.id)
     ensure_user_in_stats(uid)
+    stats_accumulator.merge_user(uid)
     stats = member_stats.get(uid, {})
+    daily, weekly, monthly = message_counts(stats)
 
     embed = discord.Embed(
         title=f"{interaction.user.display_name}'s Message Stats",
         color=BOT_CONFIG["default_embed_color"]
     )
-    embed.add_field(name="Daily", value=stats.get("daily_messages", 0), inline=True)
-    embed.add_field(name="Weekly", value=stats.get("weekly_messages", 0), inline=True)
-    embed.add_field(name="Monthly", value=stats.get("monthly_messages", 0), inline=True)
+    embed.add_field(name="Today", value=daily, inline=True)
+    embed.add_field(name="This Week", value=weekly, inline=True)
+    embed.add_field(name="This Month", value=monthly, inline=True)
     embed.add_field(name="All Time", value=stats.get("all_time_messages", 0), inline=False)
 
     await interaction.response.send_message(embed=embed, ephemeral=True)
@@ -2585,16 +5043,25 @@ async def giveaway_claim(interaction: discord.Interaction):
 async def giveaway_unclaimed(interaction: discord.Interaction):
     unclaimed_giveaways = []
 
-    for giveaway_id, giveaway in giveaways_data.items():
-        if giveaway.get("status") == "ended" and giveaway.get("winners_list"):
-            claimed_winners = giveaway.get("claimed_winners", [])
-            unclaimed_winners = [w for w in giveaway["winners_list"] if w not in claimed_winners]
-            
-            if unclaimed_winners:
-                unclaimed_giveaways.append({
-                    "name": giveaway["name"],
-                    "unclaimed_count": len(unclaimed_winners)
-                })
+    if sqlite_backend:
+        # Indexed lookup instead of scanning every giveaway ever run
+        giveaways_data.flush()
+        for giveaway_id, giveaway, unclaimed_winners in sqlite_backend.unclaimed_giveaways():
+            unclaimed_giveaways.append({
+                "name": giveaway["name"],
+                "unclaimed_count": len(unclaimed_winners)
+            })
+    else:
+        for giveaway_id, giveaway in giveaways_data.items():
+            if giveaway.get("status") == "ended" and giveaway.get("winners_list"):
+                claimed_winners = giveaway.get("claimed_winners", [])
+                unclaimed_winners = [w for w in giveaway["winners_list"] if w not in claimed_winners]
+                
+                if unclaimed_winners:
+                    unclaimed_giveaways.append({
+                        "name": giveaway["name"],
+                        "unclaimed_count": len(unclaimed_winners)
+                    })
 
     embed = discord.Embed(
         title="Unclaimed Giveaway Prizes",
@@ -2611,6 +5078,38 @@ async def giveaway_unclaimed(interaction: discord.Interaction):
 
     await interaction.response.send_message(embed=embed)
 
+@tree.command(name="giveaway_verify", description="Re-run a giveaway draw to check its winners", guild=discord.Object(id=GUILD_ID))
+@guild_only()
+@app_commands.describe(giveaway_id="ID of the ended giveaway")
+async def giveaway_verify(interaction: discord.Interaction, giveaway_id: str):
+    giveaway = giveaways_data.get(giveaway_id)
+    if not giveaway or giveaway.get("status") != "ended":
+        await interaction.response.send_message("Ended giveaway not found.", ephemeral=True)
+        return
+    if not giveaway.get("draw_seed"):
+        await interaction.response.send_message("This giveaway was drawn before draws were recorded and can't be verified.", ephemeral=True)
+        return
+
+    participants = giveaway.get("participants", {})
+    redrawn = draw_giveaway_winners(participants, giveaway["winners"], giveaway["draw_seed"])
+    matches = redrawn == giveaway.get("winners_list", [])
+
+    embed = discord.Embed(
+        title=f"{'✅' if matches else '❌'} Giveaway Draw: {giveaway['name']}",
+        description="The recorded winners match a fresh draw." if matches else "The recorded winners do not match a fresh draw!",
+        color=0x00FF00 if matches else 0xFF0000
+    )
+    embed.add_field(name="Method", value=giveaway.get("draw_method", GIVEAWAY_DRAW_METHOD), inline=True)
+    embed.add_field(name="Seed", value=f"`{giveaway['draw_seed']}`", inline=True)
+    embed.add_field(
+        name="Pool",
+        value=f"{len(participants)} participants • {sum(p.get('entries', 1) for p in participants.values())} entries",
+        inline=True
+    )
+    embed.add_field(name="Winners", value="\n".join(f"<@{user_id}>" for user_id in redrawn) or "None", inline=False)
+
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
 @tree.command(name="level", description="Check level and XP", guild=discord.Object(id=GUILD_ID))
 @guild_only()
 @app_commands.describe(user="User to check (optional)")
@@ -2618,6 +5117,7 @@ async def level(interaction: discord.Interaction, user: discord.Member = None):
     target_user = user or interaction.user
     uid = str(target_user.id)
     ensure_user_in_stats(uid)
+    stats_accumulator.merge_user(uid)
 
     data = member_stats.get(uid, {})
     level = calculate_level(data.get("xp", 0))
@@ -2648,8 +5148,189 @@ async def level(interaction: discord.Interaction, user: discord.Member = None):
     embed.add_field(name="XP", value=str(xp), inline=True)
     embed.add_field(name="Progress", value=f"{bar} {current_progress}/{needed_for_next} XP", inline=False)
 
+    rank = leaderboards["xp"].rank(uid)
+    if rank:
+        embed.set_footer(text=f"Rank #{rank} of {len(leaderboards['xp'])}")
+
     await interaction.response.send_message(embed=embed)
 
+LEADERBOARD_PAGE_SIZE = 10
+
+class LeaderboardView(discord.ui.View):
+    def __init__(self, user_id: str, board: str, page: int = 0):
+        super().__init__(timeout=300)
+        self.user_id = user_id
+        self.board = board
+        self.page = page
+
+    def page_count(self):
+        return max(1, math.ceil(len(leaderboards[self.board]) / LEADERBOARD_PAGE_SIZE))
+
+    def build_embed(self):
+        leaderboard = leaderboards[self.board]
+        self.page = max(0, min(self.page, self.page_count() - 1))
+        offset = self.page * LEADERBOARD_PAGE_SIZE
+        currency = get_currency_symbol()
+
+        lines = []
+        for position, (user_id, value) in enumerate(leaderboard.page(offset, LEADERBOARD_PAGE_SIZE), start=offset + 1):
+            amount = f"{currency}{value:,}" if self.board == "balance" else f"{value:,} {leaderboard.unit}"
+            lines.append(f"**#{position}** <@{user_id}> • {amount}")
+
+        embed = discord.Embed(
+            title=f"🏆 {leaderboard.title} Leaderboard",
+            description="\n".join(lines) or "Nobody is ranked yet.",
+            color=BOT_CONFIG["default_embed_color"]
+        )
+        rank = leaderboard.rank(self.user_id)
+        rank_text = f"Your rank: #{rank} of {len(leaderboard)}" if rank else "You are not ranked yet"
+        embed.set_footer(text=f"{rank_text} • Page {self.page + 1}/{self.page_count()}")
+        return embed
+
+    @discord.ui.button(label="◀️ Previous", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page -= 1
+        await interaction.response.edit_message(embed=self.build_embed(), view=self)
+
+    @discord.ui.button(label="📍 My Rank", style=discord.ButtonStyle.primary)
+    async def my_rank(self, interaction: discord.Interaction, button: discord.ui.Button):
+        rank = leaderboards[self.board].rank(str(interaction.user.id))
+        if rank:
+            self.page = (rank - 1) // LEADERBOARD_PAGE_SIZE
+        await interaction.response.edit_message(embed=self.build_embed(), view=self)
+
+    @discord.ui.button(label="▶️ Next", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page += 1
+        await interaction.response.edit_message(embed=self.build_embed(), view=self)
+
+    @discord.ui.select(
+        placeholder="Switch leaderboard...",
+        options=[
+            discord.SelectOption(label="XP", value="xp", description="Ranked by total XP"),
+            discord.SelectOption(label="Balance", value="balance", description="Ranked by currency balance"),
+            discord.SelectOption(label="Messages", value="messages", description="Ranked by all-time messages"),
+        ]
+    )
+    async def board_select(self, interaction: discord.Interaction, select: discord.ui.Select):
+        self.board = select.values[0]
+        self.page = 0
+        await interaction.response.edit_message(embed=self.build_embed(), view=self)
+
+@tree.command(name="leaderboard", description="View the server leaderboards", guild=discord.Object(id=GUILD_ID))
+@guild_only()
+@app_commands.describe(board="Which leaderboard to show", page="Page to start on")
+@app_commands.choices(board=[
+    app_commands.Choice(name="XP", value="xp"),
+    app_commands.Choice(name="Balance", value="balance"),
+    app_commands.Choice(name="Messages", value="messages"),
+])
+async def leaderboard(interaction: discord.Interaction, board: app_commands.Choice[str] = None, page: app_commands.Range[int, 1] = 1):
+    # Fold buffered message stats in so the rankings are current
+    stats_accumulator.merge()
+
+    view = LeaderboardView(str(interaction.user.id), board.value if board else "xp", page - 1)
+    await interaction.response.send_message(embed=view.build_embed(), view=view)
+
+def parse_date_option(value: str):
+    return datetime.strptime(value.strip(), "%Y-%m-%d").date()
+
+@tree.command(name="analytics", description="View server activity analytics", guild=discord.Object(id=GUILD_ID))
+@guild_only()
+@app_commands.describe(
+    days="Number of days to cover, ending on the end date",
+    start="Start date (YYYY-MM-DD), overrides days",
+    end="End date (YYYY-MM-DD), defaults to today"
+)
+async def analytics(interaction: discord.Interaction, days: app_commands.Range[int, 1, 366] = 30, start: str = None, end: str = None):
+    if not has_staff_role(interaction):
+        await interaction.response.send_message("You don't have permission to view analytics.", ephemeral=True)
+        return
+
+    try:
+        end_date = parse_date_option(end) if end else date.today()
+        start_date = parse_date_option(start) if start else end_date - timedelta(days=days - 1)
+    except ValueError:
+        await interaction.response.send_message("Dates must be in YYYY-MM-DD format.", ephemeral=True)
+        return
+
+    if start_date > end_date:
+        await interaction.response.send_message("The start date must be before the end date.", ephemeral=True)
+        return
+    if (end_date - start_date).days >= ACTIVITY_RETENTION_DAYS:
+        await interaction.response.send_message(f"Ranges are limited to {ACTIVITY_RETENTION_DAYS} days.", ephemeral=True)
+        return
+
+    # Older days may have to be read from disk first
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    summary = await activity_history.summary(start_date, end_date)
+    length = len(summary["daily_totals"])
+
+    embed = discord.Embed(
+        title="📈 Server Activity",
+        description=f"{start_date:%Y-%m-%d} to {end_date:%Y-%m-%d} ({length} days)",
+        color=BOT_CONFIG["default_embed_color"]
+    )
+    embed.add_field(name="Messages", value=f"{summary['messages']:,}", inline=True)
+    embed.add_field(name="Active Members", value=f"{summary['active_users']:,}", inline=True)
+    embed.add_field(name="Daily Average", value=f"{summary['messages'] / length:,.1f}", inline=True)
+
+    if summary["retention"] is None:
+        retention = "No activity in the previous period"
+    else:
+        retention = f"{summary['retention']:.1%} of {summary['previous_active_users']:,} members from the previous {length} days"
+    embed.add_field(name="Retention", value=retention, inline=False)
+
+    busiest_day, busiest_count = summary["busiest_day"]
+    embed.add_field(name="Busiest Day", value=f"{busiest_day:%Y-%m-%d} ({busiest_count:,} messages)", inline=True)
+
+    top_channels = "\n".join(f"<#{channel_id}>: {count:,}" for channel_id, count in summary["top_channels"])
+    embed.add_field(name="Top Channels", value=top_channels or "No messages", inline=False)
+
+    await interaction.followup.send(embed=embed, ephemeral=True)
+
+@tree.command(name="chart", description="Render activity and leaderboard charts", guild=discord.Object(id=GUILD_ID))
+@guild_only()
+@app_commands.describe(kind="Chart to render", days="Days of activity to chart, ending today")
+@app_commands.choices(kind=[
+    app_commands.Choice(name="Daily Activity", value="activity"),
+    app_commands.Choice(name="XP Leaderboard", value="xp"),
+    app_commands.Choice(name="Balance Leaderboard", value="balance"),
+    app_commands.Choice(name="Message Leaderboard", value="messages"),
+])
+async def chart(interaction: discord.Interaction, kind: app_commands.Choice[str], days: app_commands.Range[int, 2, 366] = 30):
+    if not has_staff_role(interaction):
+        await interaction.response.send_message("You don't have permission to view charts.", ephemeral=True)
+        return
+
+    await interaction.response.defer(ephemeral=True, thinking=True)
+
+    if kind.value == "activity":
+        end_date = date.today()
+        start_date = end_date - timedelta(days=days - 1)
+        summary = await activity_history.summary(start_date, end_date)
+        labels = [(start_date + timedelta(days=offset)).strftime("%m-%d") for offset in range(days)]
+        png = await chart_renderer.render(
+            "activity", f"Messages per day, {start_date:%Y-%m-%d} to {end_date:%Y-%m-%d}",
+            labels, summary["daily_totals"], embed_color_rgb()
+        )
+    else:
+        stats_accumulator.merge()
+        board = leaderboards[kind.value]
+        top = board.page(0, 10)
+        names = []
+        for user_id, _ in top:
+            member = interaction.guild.get_member(int(user_id))
+            names.append(member.display_name if member else user_id)
+        png = await chart_renderer.render(
+            "leaderboard", f"{board.title} leaderboard", names, [value for _, value in top], embed_color_rgb()
+        )
+
+    file = discord.File(io.BytesIO(png), filename=f"{kind.value}_chart.png")
+    embed = discord.Embed(title=f"📊 {kind.name}", color=BOT_CONFIG["default_embed_color"])
+    embed.set_image(url=f"attachment://{kind.value}_chart.png")
+    await interaction.followup.send(embed=embed, file=file, ephemeral=True)
+
 @tree.command(name="viewslots", description="View your premium auction slots", guild=discord.Object(id=GUILD_ID))
 @guild_only()
 async def viewslots(interaction: discord.Interaction):
@@ -2735,8 +5416,7 @@ async def balance_give(interaction: discord.Interaction, member: discord.Member,
 
     user_id = str(member.id)
     ensure_user_in_stats(user_id)
-    user_balances[user_id] = user_balances.get(user_id, 0) + amount
-    save_json("balances.json", user_balances)
+    adjust_balance(user_id, amount, "balance_give", staff_id=interaction.user.id)
 
     currency_symbol = get_currency_symbol()
     await interaction.response.send_message(f"✅ Gave {currency_symbol}{amount} to {member.mention}. Their new balance is {currency_symbol}{user_balances[user_id]}.")
@@ -2756,9 +5436,7 @@ async def balance_remove(interaction: discord.Interaction, member: discord.Membe
     user_id = str(member.id)
     ensure_user_in_stats(user_id)
     current_balance = user_balances.get(user_id, 0)
-    new_balance = max(0, current_balance - amount)
-    user_balances[user_id] = new_balance
-    save_json("balances.json", user_balances)
+    new_balance = adjust_balance(user_id, max(0, current_balance - amount) - current_balance, "balance_remove", staff_id=interaction.user.id)
 
     currency_symbol = get_currency_symbol()
     await interaction.response.send_message(f"✅ Removed {currency_symbol}{amount} from {member.mention}. Their new balance is {currency_symbol}{new_balance}.")
@@ -2786,7 +5464,7 @@ async def ban_member(interaction: discord.Interaction, member: discord.Member, r
         if logging_settings.get("moderation_channel_id"):
             log_channel = bot.get_channel(logging_settings["moderation_channel_id"])
             if log_channel:
-                await log_channel.send(embed=embed)
+                outbound.send(log_channel, embed=embed, priority=PRIORITY_LOW)
                 
     except discord.Forbidden:
         await interaction.response.send_message("I don't have permission to ban this user.", ephemeral=True)
@@ -2816,7 +5494,7 @@ async def kick_member(interaction: discord.Interaction, member: discord.Member,
         if logging_settings.get("moderation_channel_id"):
             log_channel = bot.get_channel(logging_settings["moderation_channel_id"])
             if log_channel:
-                await log_channel.send(embed=embed)
+                outbound.send(log_channel, embed=embed, priority=PRIORITY_LOW)
                 
     except discord.Forbidden:
         await interaction.response.send_message("I don't have permission to kick this user.", ephemeral=True)
@@ -2911,30 +5589,107 @@ async def purge_messages(interaction: discord.Interaction, amount: int):
         await interaction.response.send_message(f"Failed to purge messages: {str(e)}", ephemeral=True)
 
 # Background tasks and event handlers
-@tasks.loop(hours=24)
-async def reset_daily():
-    for uid in member_stats:
-        member_stats[uid]["daily_messages"] = 0
-    save_json("member_stats.json", member_stats)
-
-@tasks.loop(minutes=1)
-async def check_giveaways():
-    current_time = int(time.time())
+@tasks.loop(seconds=FLUSH_INTERVAL_SECONDS)
+async def flush_stores():
+    # An exception would end the loop and silently stop write-behind, so log
+    # it and leave whatever is still dirty or unwritten for the next tick
+    try:
+        stats_accumulator.merge()
+        store_writer.retry_failed()
+        persistence.flush()
+        await activity_history.save_if_due()
+    except Exception:
+        logger.exception("Store flush failed; retrying on the next tick")
+
+@tasks.loop(minutes=5)
+async def unload_idle_stores():
+    unloaded = persistence.unload_idle()
+    if unloaded:
+        logger.info(f"Unloaded idle stores: {', '.join(unloaded)}")
+
+GIVEAWAY_DRAW_METHOD = "efraimidis-spirakis-v1"
+
+def draw_giveaway_winners(participants, winner_count, seed):
+    """Pick ``winner_count`` distinct winners weighted by entries, reproducibly from ``seed``."""
+    rand = random.Random(seed).random
+    log = math.log
+    user_ids = list(participants)
+    entries = [data.get("entries", 1) for data in participants.values()]
+    keys = [log(1.0 - rand()) / weight if weight > 0 else -math.inf for weight in entries]
+    eligible = sum(1 for weight in entries if weight > 0)
+    rows = heapq.nlargest(min(winner_count, eligible), range(len(user_ids)), key=keys.__getitem__)
+    return [user_ids[row] for row in rows]
+
+class GiveawayScheduler:
+    """Ends giveaways on time from a min-heap of (end_time, giveaway_id)."""
+
+    # Re-check at least this often so a wall clock change can't strand a deadline
+    MAX_SLEEP_SECONDS = 3600
+
+    def __init__(self):
+        self.heap = []
+        self.wakeup = asyncio.Event()
+        self.task = None
+
+    def rebuild(self):
+        self.heap = [
+            (giveaway["end_time"], giveaway_id)
+            for giveaway_id, giveaway in giveaways_data.items()
+            if giveaway.get("status") == "active"
+        ]
+        heapq.heapify(self.heap)
+        self.wakeup.set()
+
+    def schedule(self, giveaway_id, end_time):
+        heapq.heappush(self.heap, (end_time, giveaway_id))
+        self.wakeup.set()
+
+    def start(self):
+        if self.task is None or self.task.done():
+            self.rebuild()
+            self.task = asyncio.create_task(self.run())
+
+    async def run(self):
+        while True:
+            self.wakeup.clear()
+            timeout = self.MAX_SLEEP_SECONDS
+            while self.heap and self.heap[0][0] <= time.time():
+                end_time, giveaway_id = heapq.heappop(self.heap)
+                giveaway = giveaways_data.get(giveaway_id)
+                if not giveaway or giveaway.get("status") != "active" or giveaway.get("end_time") != end_time:
+                    continue
+
+                guild = bot.get_guild(GUILD_ID)
+                if guild is None:
+                    # Not connected yet; try again shortly
+                    heapq.heappush(self.heap, (end_time, giveaway_id))
+                    timeout = 5
+                    break
+                try:
+                    await end_giveaway(giveaway_id, guild)
+                except Exception as e:
+                    logger.error(f"Failed to end giveaway {giveaway_id}: {e}")
 
-    for giveaway_id, giveaway in list(giveaways_data.items()):
-        if giveaway["status"] == "active" and current_time >= giveaway["end_time"]:
-            guild = bot.get_guild(GUILD_ID)
-            if guild:
-                await end_giveaway(giveaway_id, guild)
+            if self.heap and timeout == self.MAX_SLEEP_SECONDS:
+                timeout = min(timeout, max(self.heap[0][0] - time.time(), 0))
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+giveaway_scheduler = GiveawayScheduler()
 
 async def end_giveaway(giveaway_id: str, guild: discord.Guild):
     giveaway = giveaways_data.get(giveaway_id)
     if not giveaway or giveaway["status"] != "active":
         return
 
-    # Mark as ended immediately to prevent duplicate endings
+    # Mark as ended immediately to prevent duplicate endings; once that is
+    # on disk the participant list is final and its join log can go
     giveaway["status"] = "ended"
-    save_json("giveaways.json", giveaways_data)
+    giveaway_rules.pop(giveaway_id, None)
+    if await persistence.save_durable("giveaways.json"):
+        participant_log.remove(giveaway_id)
 
     channel = guild.get_channel(giveaway["channel_id"])
     if not channel:
@@ -2950,22 +5705,11 @@ async def end_giveaway(giveaway_id: str, guild: discord.Guild):
         await channel.send(embed=embed)
         return
 
-    # Select winners
-    weighted_participants = []
-    for user_id, data in giveaway["participants"].items():
-        weighted_participants.extend([user_id] * data["entries"])
-
-    winner_count = min(giveaway["winners"], len(giveaway["participants"]))
-    winners = random.sample(weighted_participants, winner_count)
-
-    # Remove duplicates
-    unique_winners = []
-    seen = set()
-    for winner in winners:
-        if winner not in seen:
-            unique_winners.append(winner)
-            seen.add(winner)
-
+    # Select winners; the seed is kept so anyone can re-run the draw
+    seed = secrets.token_hex(16)
+    unique_winners = draw_giveaway_winners(giveaway["participants"], giveaway["winners"], seed)
+    giveaway["draw_seed"] = seed
+    giveaway["draw_method"] = GIVEAWAY_DRAW_METHOD
     giveaway["winners_list"] = unique_winners
 
     # Create winner announcement
@@ -2989,28 +5733,231 @@ async def end_giveaway(giveaway_id: str, guild: discord.Guild):
     await channel.send(content=winner_pings, embed=embed)
     save_json("giveaways.json", giveaways_data)
 
-@tasks.loop(hours=6)
+# Held by create_backup and prune_backups so pruning never removes an object a
+# backup in progress has reused but not yet listed in its manifest
+backup_lock = threading.Lock()
+
+def backup_object_path(digest):
+    return os.path.join(BACKUP_DIR, "objects", digest[:2], f"{digest}.gz")
+
+def create_backup(snapshots):
+    """Write a backup manifest and any new objects; runs in the executor."""
+    with backup_lock:
+        return write_backup(snapshots)
+
+def write_backup(snapshots):
+    timestamp = datetime.now().strftime(BACKUP_NAME_FORMATS[0])
+    backup_dir = os.path.join(BACKUP_DIR, f"backup_{timestamp}")
+    os.makedirs(backup_dir)
+
+    manifest = {"created_at": int(time.time()), "format": store_serializer.name, "files": {}}
+    new_objects = 0
+    new_bytes = 0
+    for file_name, data in snapshots.items():
+        if data is not None:
+            payload = encode_store(data)
+        elif os.path.exists(file_name):
+            with open(file_name, "rb") as f:
+                payload = f.read()
+        else:
+            continue
+
+        digest = hashlib.sha256(payload).hexdigest()
+        manifest["files"][file_name] = {"sha256": digest, "size": len(payload)}
+
+        object_path = backup_object_path(digest)
+        if os.path.exists(object_path):
+            # Unchanged since an earlier backup
+            continue
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        compressed = gzip.compress(payload, compresslevel=6)
+        write_file_atomic(object_path, compressed)
+        new_objects += 1
+        new_bytes += len(compressed)
+
+    write_file_atomic(os.path.join(backup_dir, "manifest.json"), json.dumps(manifest, indent=2).encode("utf-8"))
+    return backup_dir, new_objects, new_bytes
+
+def parse_backup_time(timestamp):
+    for fmt in BACKUP_NAME_FORMATS:
+        try:
+            return datetime.strptime(timestamp, fmt)
+        except ValueError:
+            continue
+    return None
+
+def list_backup_dirs():
+    """Backup directories sorted newest first, with their creation time."""
+    backups = []
+    if not os.path.isdir(BACKUP_DIR):
+        return backups
+    for name in os.listdir(BACKUP_DIR):
+        if not name.startswith("backup_"):
+            continue
+        created = parse_backup_time(name[len("backup_"):])
+        if created is not None:
+            backups.append((created, name))
+    backups.sort(reverse=True)
+    return backups
+
+def prune_backups():
+    """Apply the hourly/daily/weekly retention policy and drop unused objects."""
+    with backup_lock:
+        return remove_expired_backups()
+
+def remove_expired_backups():
+    backups = list_backup_dirs()
+    keep = {name for _, name in backups[:1]}
+    for period, fmt in (("hourly", "%Y%m%d%H"), ("daily", "%Y%m%d"), ("weekly", "%G%V")):
+        buckets = set()
+        for created, name in backups:
+            bucket = created.strftime(fmt)
+            if bucket in buckets:
+                continue
+            if len(buckets) >= BACKUP_RETENTION[period]:
+                break
+            buckets.add(bucket)
+            keep.add(name)
+
+    removed = 0
+    for _, name in backups:
+        if name not in keep:
+            shutil.rmtree(os.path.join(BACKUP_DIR, name), ignore_errors=True)
+            removed += 1
+
+    referenced = set()
+    for name in keep:
+        manifest_path = os.path.join(BACKUP_DIR, name, "manifest.json")
+        if os.path.exists(manifest_path):
+            with open(manifest_path, "r") as f:
+                referenced.update(entry["sha256"] for entry in json.load(f)["files"].values())
+
+    objects_dir = os.path.join(BACKUP_DIR, "objects")
+    for root, _, files in os.walk(objects_dir):
+        for file in files:
+            if file.endswith(".gz") and file[:-3] not in referenced:
+                os.remove(os.path.join(root, file))
+    return removed
+
+def read_backup(name):
+    """Return (payloads, problems) for a backup: file name -> raw bytes."""
+    backup_dir = os.path.join(BACKUP_DIR, name)
+    if not name.startswith("backup_") or not os.path.isdir(backup_dir):
+        raise FileNotFoundError(f"Backup {name} not found")
+
+    payloads = {}
+    problems = []
+    manifest_path = os.path.join(backup_dir, "manifest.json")
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+        for file_name, entry in manifest["files"].items():
+            object_path = backup_object_path(entry["sha256"])
+            try:
+                with gzip.open(object_path, "rb") as f:
+                    payload = f.read()
+            except (OSError, EOFError) as e:
+                problems.append(f"{file_name}: unreadable object ({e})")
+                continue
+            if hashlib.sha256(payload).hexdigest() != entry["sha256"]:
+                problems.append(f"{file_name}: checksum mismatch")
+                continue
+            payloads[file_name] = payload
+    else:
+        for file_name in sorted(os.listdir(backup_dir)):
+            if file_name.endswith(".json"):
+                with open(os.path.join(backup_dir, file_name), "rb") as f:
+                    payloads[file_name] = f.read()
+    return payloads, problems
+
+def verify_backup(name):
+    """Decode every file of a backup; returns (stores, problems)."""
+    payloads, problems = read_backup(name)
+    stores = {}
+    for file_name, payload in payloads.items():
+        try:
+            stores[file_name] = decode_store(payload)
+        except Exception as e:
+            problems.append(f"{file_name}: parse error ({e})")
+    return stores, problems
+
+# Callbacks that rebuild state derived from the stores after a restore
+restore_hooks = [stats_accumulator.clear, rebuild_verification_matcher, rebuild_autoresponder_engine, reset_leaderboards, giveaway_scheduler.rebuild, rebuild_giveaway_rules]
+
+def apply_restore(stores):
+    """Swap restored data into the live stores in place."""
+    restored = []
+    for file_name, data in stores.items():
+        target = persistence.stores.get(file_name)
+        if target is None:
+            continue
+        target.clear()
+        target.update(data)
+        restored.append(file_name)
+
+    # The economy journal and the giveaway join logs describe changes on top
+    # of the snapshots that were just replaced. Reset them in this same step,
+    # before anything can append to them again; a change made after the swap
+    # must land in the fresh journal rather than be archived with the old one.
+    if any(file_name in restored for file_name in ECONOMY_STORES):
+        economy_journal.reset()
+    if "giveaways.json" in restored:
+        participant_log.clear()
+
+    for hook in restore_hooks:
+        try:
+            hook()
+        except Exception as e:
+            logger.error(f"Restore hook {hook.__name__} failed: {e}")
+    return restored
+
+def backup_snapshots():
+    stats_accumulator.merge()
+    # Serialize the in-memory stores so buffered writes are included and the
+    # backup is independent of the storage backend. Unloaded lazy stores are
+    # current on disk and are read from their file instead.
+    snapshots = {}
+    for file_name, data in persistence.stores.items():
+        if isinstance(data, LazyStore) and not data.is_loaded():
+            snapshots[file_name] = None
+        else:
+            # New members shift the stats columns and the indented JSON
+            # encoder isn't thread safe, so prepare the data here on the loop
+            snapshots[file_name] = prepare_store(data)
+    return snapshots
+
+async def restore_backup(name):
+    """Verify a backup and restore it; returns (restored file names, problems)."""
+    loop = asyncio.get_running_loop()
+    stores, problems = await loop.run_in_executor(None, verify_backup, name)
+    if problems:
+        return [], problems
+
+    # Keep the current state recoverable in case the wrong snapshot was picked
+    safety_dir, _, _ = await loop.run_in_executor(None, create_backup, backup_snapshots())
+    logger.info(f"Pre-restore backup created: {safety_dir}")
+
+    restored = apply_restore(stores)
+    # Both economy stores share the journal that was just reset, so the one
+    # that wasn't restored needs a fresh snapshot too
+    to_save = list(restored)
+    if any(file_name in restored for file_name in ECONOMY_STORES):
+        to_save.extend(file_name for file_name in ECONOMY_STORES if file_name not in restored)
+    if not await persistence.save_durable(*to_save):
+        return restored, ["Restored in memory, but some stores failed to save; they will be retried"]
+
+    logger.info(f"Restored backup {name}: {', '.join(restored)}")
+    return restored, []
+
+@tasks.loop(hours=1)
 async def automated_backup():
-    """Create automated backups every 6 hours"""
+    """Create an incremental backup every hour and prune old ones"""
     try:
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_dir = f"backups/backup_{timestamp}"
-        os.makedirs(backup_dir, exist_ok=True)
-
-        data_files = [
-            "bot_config.json", "tierlist.json", "member_stats.json", "shops.json", 
-            "balances.json", "inventories.json", "reaction_roles.json", 
-            "sticky_messages.json", "server_settings.json", "verification.json", 
-            "auctions.json", "user_profiles.json", "giveaways.json", 
-            "premium_slots.json", "logging_settings.json", "member_warnings.json", 
-            "autoresponders.json", "profile_presets.json"
-        ]
+        loop = asyncio.get_running_loop()
+        backup_dir, new_objects, new_bytes = await loop.run_in_executor(None, create_backup, backup_snapshots())
+        removed = await loop.run_in_executor(None, prune_backups)
 
-        for file in data_files:
-            if os.path.exists(file):
-                shutil.copy2(file, backup_dir)
-
-        logger.info(f"Backup created: {backup_dir}")
+        logger.info(f"Backup created: {backup_dir} ({new_objects} new objects, {new_bytes} bytes; pruned {removed} old backups)")
     except Exception as e:
         logger.error(f"Backup failed: {e}")
 
@@ -3042,9 +5989,10 @@ async def on_reaction_add(reaction, user):
         user_id = str(user.id)
         ensure_user_in_stats(user_id)
         
-        member_stats[user_id]["xp"] += reward.get("xp", 0)
-        user_balances[user_id] = user_balances.get(user_id, 0) + reward.get("currency", 0)
-        save_all()
+        if reward.get("xp", 0):
+            stats_accumulator.add(user_id, 0, reward["xp"])
+        if reward.get("currency", 0):
+            adjust_balance(user_id, reward["currency"], "reaction_reward", message_id=message_id, emoji=emoji_str)
 
 @bot.event
 async def on_reaction_remove(reaction, user):
@@ -3068,73 +6016,188 @@ async def on_reaction_remove(reaction, user):
             except:
                 pass
 
-@bot.event
-async def on_message(message):
-    if message.author.bot or message.guild is None or message.guild.id != GUILD_ID:
+# --------- Message Pipeline -----------
+
+class StageMetrics:
+    __slots__ = ("calls", "errors", "total", "slowest")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total = 0.0
+        self.slowest = 0.0
+
+    def record(self, elapsed):
+        self.calls += 1
+        self.total += elapsed
+        if elapsed > self.slowest:
+            self.slowest = elapsed
+
+    @property
+    def average(self):
+        return self.total / self.calls if self.calls else 0.0
+
+class MessagePipeline:
+    """Runs on_message work as registered stages on a pool of workers."""
+
+    def __init__(self, max_queue=MESSAGE_QUEUE_SIZE, worker_count=MESSAGE_WORKERS):
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.worker_count = worker_count
+        self.workers = []
+        self.stages = []
+        self.received = 0
+        self.processed = 0
+        self.high_water = 0
+        self.blocked = 0
+        self.blocked_time = 0.0
+        self.queue_wait = 0.0
+
+    def stage(self, name):
+        def decorator(func):
+            self.add_stage(name, func)
+            return func
+        return decorator
+
+    def add_stage(self, name, func):
+        self.stages.append((name, func, StageMetrics()))
+
+    def start(self):
+        self.workers = [worker for worker in self.workers if not worker.done()]
+        while len(self.workers) < self.worker_count:
+            self.workers.append(asyncio.create_task(self.worker()))
+
+    async def submit(self, message):
+        self.received += 1
+        item = (time.monotonic(), message)
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.blocked += 1
+            await self.queue.put(item)
+            self.blocked_time += time.monotonic() - item[0]
+        self.high_water = max(self.high_water, self.queue.qsize())
+
+    async def worker(self):
+        while True:
+            queued_at, message = await self.queue.get()
+            self.queue_wait += time.monotonic() - queued_at
+            try:
+                await self.process(message)
+            finally:
+                self.processed += 1
+                self.queue.task_done()
+
+    async def drain(self, timeout):
+        """Wait up to ``timeout`` seconds for the queued messages to be processed."""
+        if not self.workers:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Shutting down with {self.queue.qsize()} queued messages unprocessed")
+
+    async def process(self, message):
+        for name, func, metrics in self.stages:
+            started = time.perf_counter()
+            try:
+                await func(message)
+            except Exception as e:
+                metrics.errors += 1
+                logger.error(f"Message stage {name} failed for message {message.id}: {e}")
+            metrics.record(time.perf_counter() - started)
+
+    def report(self):
+        average_wait = self.queue_wait / self.processed * 1000 if self.processed else 0.0
+        summary = (
+            f"{self.queue.qsize()}/{self.queue.maxsize} queued (peak {self.high_water}) • "
+            f"{len(self.workers)} workers • {self.processed}/{self.received} processed\n"
+            f"Avg queue wait {average_wait:.1f}ms • intake blocked {self.blocked}x ({self.blocked_time:.1f}s)"
+        )
+        stages = "\n".join(
+            f"`{name}` {metrics.calls} runs • avg {metrics.average * 1000:.2f}ms • "
+            f"max {metrics.slowest * 1000:.0f}ms • {metrics.errors} errors"
+            for name, _, metrics in self.stages
+        )
+        return summary, stages or "No stages registered"
+
+message_pipeline = MessagePipeline()
+
+@message_pipeline.stage("stats")
+async def stats_stage(message):
+    # Track member stats (buffered, merged into member_stats on the flush timer)
+    old_xp, new_xp = stats_accumulator.add(str(message.author.id), 1, XP_PER_MESSAGE)
+    activity_history.record(message.author.id, message.channel.id)
+
+    # Check for level up
+    old_level = calculate_level(old_xp)
+    new_level = calculate_level(new_xp)
+
+    # Send level up notification
+    if new_level > old_level and BOT_CONFIG.get("levelup_channel_id"):
+        levelup_channel = bot.get_channel(BOT_CONFIG["levelup_channel_id"])
+        if levelup_channel:
+            outbound.send(levelup_channel, f"🎉 {message.author.mention} leveled up to Level {new_level}!", coalesce="levelup")
+
+@message_pipeline.stage("verification")
+async def verification_stage(message):
+    # Matcher is None unless verification can trigger
+    matcher = verification_matcher
+    if (matcher is None or not matcher.applies_to(message.channel.id)
+            or not matcher.matches(message.content)):
         return
 
-    # Check verification system
-    if verification_data.get("enabled", False):
-        verification_word = verification_data.get("word", "").lower()
-        verification_role_id = verification_data.get("role_id")
-        verification_channel_id = verification_data.get("channel_id")
-        delete_messages = verification_data.get("delete_messages", False)
-        
-        # Check if verification should work in this channel
-        if not verification_channel_id or message.channel.id == verification_channel_id:
-            # Check if message contains verification word
-            if verification_word and verification_word in message.content.lower():
-                if verification_role_id:
-                    role = message.guild.get_role(verification_role_id)
-                    if role and role not in message.author.roles:
-                        try:
-                            await message.author.add_roles(role, reason="Verification system")
-                            
-                            # Send ephemeral-style response (delete after a few seconds)
-                            embed = discord.Embed(
-                                title="✅ Verification Successful",
-                                description=f"{message.author.mention}, you are now verified!",
-                                color=0x00FF00
-                            )
-                            verification_msg = await message.channel.send(embed=embed)
-                            
-                            # Delete both messages if setting is enabled
-                            if delete_messages:
-                                try:
-                                    await message.delete()
-                                    await verification_msg.delete(delay=3)  # Delete confirmation after 3 seconds
-                                except discord.NotFound:
-                                    pass  # Message already deleted
-                                except discord.Forbidden:
-                                    # If can't delete, just delete the confirmation after delay
-                                    await verification_msg.delete(delay=5)
-                            else:
-                                # Just delete confirmation message after delay
-                                await verification_msg.delete(delay=5)
-                                
-                        except discord.Forbidden:
-                            error_embed = discord.Embed(
-                                title="❌ Verification Failed",
-                                description="I don't have permission to assign roles.",
-                                color=0xFF0000
-                            )
-                            error_msg = await message.channel.send(embed=error_embed)
-                            await error_msg.delete(delay=5)
-
-    # Check AFK system
+    role = message.guild.get_role(matcher.role_id)
+    if not role or role in message.author.roles:
+        return
+
+    try:
+        await message.author.add_roles(role, reason="Verification system")
+    except discord.Forbidden:
+        error_embed = discord.Embed(
+            title="❌ Verification Failed",
+            description="I don't have permission to assign roles.",
+            color=0xFF0000
+        )
+        outbound.send(message.channel, embed=error_embed, priority=PRIORITY_HIGH, delete_after=5)
+        return
+
+    # Send ephemeral-style response (delete after a few seconds)
+    embed = discord.Embed(
+        title="✅ Verification Successful",
+        description=f"{message.author.mention}, you are now verified!",
+        color=0x00FF00
+    )
+
+    # Delete both messages if setting is enabled; the confirmation
+    # lingers longer if the original can't be deleted
+    confirmation_delay = 5
+    if matcher.delete_messages:
+        try:
+            await message.delete()
+            confirmation_delay = 3
+        except discord.NotFound:
+            confirmation_delay = 3  # Message already deleted
+        except discord.Forbidden:
+            pass
+    outbound.send(message.channel, embed=embed, priority=PRIORITY_HIGH, delete_after=confirmation_delay)
+
+message_pipeline.add_stage("autoresponders", run_autoresponders)
+
+@message_pipeline.stage("afk")
+async def afk_stage(message):
     uid = str(message.author.id)
     afk_users = server_settings.get("afk_users", {})
     if uid in afk_users:
         del afk_users[uid]
         server_settings["afk_users"] = afk_users
-        save_json("server_settings.json", server_settings)
+        persistence.touch("server_settings.json", "afk_users")
         
         embed = discord.Embed(
             title="Welcome Back!",
             description=f"{message.author.mention}, you are no longer AFK.",
             color=BOT_CONFIG["default_embed_color"]
         )
-        await message.channel.send(embed=embed, delete_after=5)
+        outbound.send(message.channel, embed=embed, priority=PRIORITY_HIGH, delete_after=5)
 
     # Check mentions for AFK users
     for mention in message.mentions:
@@ -3147,29 +6210,21 @@ async def on_message(message):
                 color=BOT_CONFIG["default_embed_color"]
             )
             embed.set_footer(text=f"AFK since: {datetime.fromtimestamp(afk_info['timestamp']).strftime('%Y-%m-%d %H:%M:%S')}")
-            await message.channel.send(embed=embed, delete_after=10)
+            outbound.send(message.channel, embed=embed, priority=PRIORITY_HIGH, delete_after=10)
 
-    # Track member stats
-    ensure_user_in_stats(uid)
-
-    # Check for level up
-    old_level = calculate_level(member_stats[uid].get("xp", 0))
-
-    member_stats[uid]["daily_messages"] += 1
-    member_stats[uid]["weekly_messages"] += 1
-    member_stats[uid]["monthly_messages"] += 1
-    member_stats[uid]["all_time_messages"] += 1
-    member_stats[uid]["xp"] += 5
+@bot.event
+async def on_message(message):
+    if message.guild is None or message.guild.id != GUILD_ID:
+        return
 
-    new_level = calculate_level(member_stats[uid]["xp"])
+    # Any message, including other bots', pushes a sticky up
+    if str(message.channel.id) in sticky_messages and message.author != bot.user:
+        schedule_sticky_repost(message.channel)
 
-    # Send level up notification
-    if new_level > old_level and BOT_CONFIG.get("levelup_channel_id"):
-        levelup_channel = bot.get_channel(BOT_CONFIG["levelup_channel_id"])
-        if levelup_channel:
-            await levelup_channel.send(f"🎉 {message.author.mention} leveled up to Level {new_level}!")
+    if message.author.bot:
+        return
 
-    save_all()
+    await message_pipeline.submit(message)
 
 # --------- Admin Commands Implementation -----------
 
@@ -3317,6 +6372,16 @@ async def debug_info(interaction: discord.Interaction):
     embed.add_field(name="Users in Stats", value=str(len(member_stats)), inline=True)
     embed.add_field(name="Active Giveaways", value=str(len([g for g in giveaways_data.values() if g.get("status") == "active"])), inline=True)
     embed.add_field(name="Total Auctions", value=str(len(auction_data)), inline=True)
+
+    embed.add_field(
+        name="Outbound Queue",
+        value=f"{outbound.pending()} queued • {outbound.sent} sent • {outbound.merged} merged • {outbound.dropped} dropped",
+        inline=False
+    )
+
+    pipeline_summary, pipeline_stages = message_pipeline.report()
+    embed.add_field(name="Message Pipeline", value=pipeline_summary, inline=False)
+    embed.add_field(name="Pipeline Stages", value=pipeline_stages, inline=False)
     
     await interaction.response.send_message(embed=embed, ephemeral=True)
 
@@ -3363,6 +6428,113 @@ async def cleanup_data(interaction: discord.Interaction):
     
     await interaction.response.send_message(embed=embed, ephemeral=True)
 
+@tree.command(name="backup", description="List, verify or restore data backups", guild=discord.Object(id=GUILD_ID))
+@guild_only()
+@app_commands.describe(action="What to do", name="Backup name (verify defaults to the newest backup)")
+@app_commands.choices(action=[
+    app_commands.Choice(name="List", value="list"),
+    app_commands.Choice(name="Verify", value="verify"),
+    app_commands.Choice(name="Restore", value="restore"),
+])
+async def backup_command(interaction: discord.Interaction, action: app_commands.Choice[str], name: str = None):
+    if not has_admin_permissions(interaction):
+        await interaction.response.send_message("You don't have permission to use this command.", ephemeral=True)
+        return
+
+    backups = list_backup_dirs()
+    if action.value == "list":
+        embed = discord.Embed(title="Data Backups", color=BOT_CONFIG["default_embed_color"])
+        if not backups:
+            embed.description = "No backups found."
+        else:
+            lines = []
+            for created, backup_name in backups[:15]:
+                kind = "incremental" if os.path.exists(os.path.join(BACKUP_DIR, backup_name, "manifest.json")) else "full copy"
+                lines.append(f"`{backup_name}` • <t:{int(created.timestamp())}:R> • {kind}")
+            embed.description = "\n".join(lines)
+            embed.set_footer(text=f"{len(backups)} backups kept")
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+        return
+
+    if action.value == "verify" and not name:
+        if not backups:
+            await interaction.response.send_message("No backups found.", ephemeral=True)
+            return
+        name = backups[0][1]
+    elif not name:
+        await interaction.response.send_message("Please give the name of the backup to restore.", ephemeral=True)
+        return
+
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    try:
+        if action.value == "verify":
+            stores, problems = await asyncio.get_running_loop().run_in_executor(None, verify_backup, name)
+            if problems:
+                embed = discord.Embed(title=f"❌ {name} has problems", description="\n".join(problems[:20]), color=0xFF0000)
+            else:
+                embed = discord.Embed(title=f"✅ {name} is valid", description=f"{len(stores)} stores checked", color=0x00FF00)
+        else:
+            restored, problems = await restore_backup(name)
+            if not restored:
+                embed = discord.Embed(title="❌ Restore aborted", description="\n".join(problems[:20]), color=0xFF0000)
+            else:
+                embed = discord.Embed(
+                    title=f"✅ Restored {name}",
+                    description=f"{len(restored)} stores reloaded. A backup of the previous state was taken first.",
+                    color=0x00FF00
+                )
+                if problems:
+                    embed.add_field(name="Warnings", value="\n".join(problems), inline=False)
+    except FileNotFoundError as e:
+        embed = discord.Embed(title="Backup not found", description=str(e), color=0xFF0000)
+
+    await interaction.followup.send(embed=embed, ephemeral=True)
+
+def backup_cli(argv):
+    parser = argparse.ArgumentParser(prog="main.py backup", description="List, verify and restore data backups")
+    actions = parser.add_subparsers(dest="action", required=True)
+    actions.add_parser("list", help="List backups, newest first")
+    verify_parser = actions.add_parser("verify", help="Check every file of a backup")
+    verify_parser.add_argument("name", nargs="?", help="Backup name (default: newest)")
+    restore_parser = actions.add_parser("restore", help="Restore a backup (stop the bot first, or use /backup)")
+    restore_parser.add_argument("name")
+    args = parser.parse_args(argv)
+
+    backups = list_backup_dirs()
+    if args.action == "list":
+        for created, backup_name in backups:
+            print(f"{backup_name}  {created:%Y-%m-%d %H:%M:%S}")
+        return 0
+
+    name = args.name or (backups[0][1] if backups else None)
+    if not name:
+        print("No backups found.")
+        return 1
+
+    try:
+        stores, problems = verify_backup(name)
+    except FileNotFoundError as e:
+        print(e)
+        return 1
+    if problems:
+        print(f"{name} has problems:")
+        for problem in problems:
+            print(f"  {problem}")
+        return 1
+
+    if args.action == "verify":
+        print(f"{name} is valid ({len(stores)} stores)")
+        return 0
+
+    safety_dir, _, _ = create_backup(backup_snapshots())
+    print(f"Backed up current state to {safety_dir}")
+    restored = apply_restore(stores)
+    # No event loop here, so these writes happen synchronously
+    persistence.save_all()
+    store_writer.flush_sync()
+    print(f"Restored {name}: {', '.join(restored)}")
+    return 0
+
 @bot.event
 async def on_ready():
     print(f"Logged in as {bot.user} (ID: {bot.user.id})")
@@ -3376,8 +6548,27 @@ async def on_ready():
         logger.error(f"Failed to sync command tree: {e}")
         print(f"Failed to sync commands: {e}")
 
-    reset_daily.start()
-    check_giveaways.start()
+    giveaway_scheduler.start()
     automated_backup.start()
+    if not flush_stores.is_running():
+        flush_stores.start()
+    if not unload_idle_stores.is_running():
+        unload_idle_stores.start()
+    message_pipeline.start()
+
+if __name__ == "__main__":
+    if CLI_COMMAND == "backup":
+        sys.exit(backup_cli(sys.argv[2:]))
 
-bot.run(TOKEN)
+    try:
+        bot.run(TOKEN)
+    finally:
+        # Anything still buffered by the write-behind layer must reach disk
+        stats_accumulator.merge()
+        # Older copies left by cancelled writes go first so the fresh saves win
+        store_writer.flush_sync()
+        persistence.flush()
+        activity_history.flush()
+        economy_journal.close()
+        participant_log.close()
+        chart_renderer.shutdown()